@@ -1,6 +1,7 @@
 # -*- coding: utf8 -*-
 import os, re, json, time, requests
 from bs4 import BeautifulSoup
+from notifier import core
 '''
 Author: cokemine
 Modifier: o0oo0ooo0 & Oreo
@@ -15,6 +16,7 @@ EUserv_PW: 密码       密码，同上且与账号一一对应
 ------------
 依赖模块说明
 pip install requests beautifulsoup4 / pip3 install requests beautifulsoup4
+云函数部署: python -m notifier.scf EUserv_extend.py 打包后上传 zip, notifier 会一起上传
 '''
 
 # 强烈建议部署在非大陆区域，例如HK、SG等
@@ -22,26 +24,25 @@ pip install requests beautifulsoup4 / pip3 install requests beautifulsoup4
 EUserv_ID = os.environ.get('EUserv_ID')  # 用户名，邮箱也可
 EUserv_PW = os.environ.get('EUserv_PW')  # 密码
 
+# 推送变量与 sendNotify.py 相同, 由 notifier 统一发送, 例如
 # Server酱 http://sc.ftqq.com/?c=code
-SCKEY = os.environ.get('PUSH_KEY')  # Server酱的key，无需推送可不填 示例: SCU646xxxxxxxxdacd6a5dc3f6
+# PUSH_KEY: Server酱的key，无需推送可不填 示例: SCU646xxxxxxxxdacd6a5dc3f6
 
 # 酷推 https://cp.xuthus.cc
-COOL_PUSH_SKEY = os.environ.get('COOL_PUSH_SKEY')
-# 通知类型 CoolPush_MODE的可选项有（默认send）：send[QQ私聊]、group[QQ群聊]、wx[个微]、ww[企微]
-COOL_PUSH_MODE = os.environ.get('COOL_PUSH_MODE')
+# COOL_PUSH_SKEY, 通知类型 COOL_PUSH_MODE 的可选项有（默认send）：send[QQ私聊]、group[QQ群聊]、wx[个微]、ww[企微]
 
-# PushPlus https://pushplus.hxtrip.com/message
-PUSH_PLUS_TOKEN = os.environ.get('PUSH_PLUS_TOKEN')
+# PushPlus https://www.pushplus.plus
+# PUSH_PLUS_TOKEN
 
 # Telegram Bot Push https://core.telegram.org/bots/api#authorizing-your-bot
-TG_BOT_TOKEN = os.environ.get('TG_BOT_TOKEN')  # 通过 @BotFather 申请获得，示例：1077xxx4424:AAFjv0FcqxxxxxxgEMGfi22B4yh15R5uw
-TG_USER_ID = os.environ.get('TG_USER_ID')  # 用户、群组或频道 ID，示例：129xxx206
-TG_API_HOST = os.environ.get('TG_API_HOST', 'api.telegram.org')  # 自建 API 反代地址，供网络环境无法访问时使用，网络正常则保持默认
+# TG_BOT_TOKEN: 通过 @BotFather 申请获得，示例：1077xxx4424:AAFjv0FcqxxxxxxgEMGfi22B4yh15R5uw
+# TG_USER_ID: 用户、群组或频道 ID，示例：129xxx206
+# TG_API_HOST: 自建 API 反代地址，供网络环境无法访问时使用，网络正常则不填
 
 # wecomchan https://github.com/easychen/wecomchan
-WECOMCHAN_DOMAIN = os.environ.get('WECOMCHAN_DOMAIN')  # http(s)://example.com/
-WECOMCHAN_SEND_KEY = os.environ.get('WECOMCHAN_SEND_KEY')
-WECOMCHAN_TO_USER = os.environ.get('WECOMCHAN_TO_USER', '@all')  # 默认全部推送, 对个别人推送可用 User1|User2
+# WECOMCHAN_DOMAIN: http(s)://example.com/
+# WECOMCHAN_SEND_KEY
+# WECOMCHAN_TO_USER: 默认全部推送, 对个别人推送可用 User1|User2
 # 变量命名使用全部小写的方式，可以使用下划线。
 desp = ''  # 不用动
 
@@ -156,67 +157,9 @@ def check(sess_id: str, session: requests.session):
         print_("ALL Work Done! Enjoy")
 
 
-# Server酱 http://sc.ftqq.com/?c=code
-def server_chan():
-    data = (
-        ('text', 'EUserv续费日志'),
-        ('desp', desp)
-    )
-    response = requests.post('https://sc.ftqq.com/' + SCKEY + '.send', data=data)
-    if response.status_code != 200:
-        print('Server酱 推送失败')
-    else:
-        print('Server酱 推送成功')
-
-
-# 酷推 https://cp.xuthus.cc/
-def coolpush():
-    c = 'EUserv续费日志\n\n' + desp
-    data = json.dumps({'c': c})
-    url = 'https://push.xuthus.cc/' + COOL_PUSH_MODE + '/' + COOL_PUSH_SKEY
-    response = requests.post(url, data=data)
-    if response.status_code != 200:
-        print('酷推 推送失败')
-    else:
-        print('酷推 推送成功')
-
-
-# PushPlus https://pushplus.hxtrip.com/message
-def push_plus():
-    data = (
-        ('token', PUSH_PLUS_TOKEN),
-        ('title', 'EUserv续费日志'),
-        ('content', desp)
-    )
-    url = 'https://pushplus.hxtrip.com/send'
-    response = requests.post(url, data=data)
-    if response.status_code != 200:
-        print('PushPlus 推送失败')
-    else:
-        print('PushPlus 推送成功')
-
-
-# Telegram Bot Push https://core.telegram.org/bots/api#authorizing-your-bot
-def telegram():
-    data = (
-        ('chat_id', TG_USER_ID),
-        ('text', 'EUserv续费日志\n\n' + desp)
-    )
-    response = requests.post('https://' + TG_API_HOST + '/bot' + TG_BOT_TOKEN + '/sendMessage', data=data)
-    if response.status_code != 200:
-        print('Telegram Bot 推送失败')
-    else:
-        print('Telegram Bot 推送成功')
-
-
-# wecomchan https://github.com/easychen/wecomchan
-def wecomchan():
-    response = requests.get(WECOMCHAN_DOMAIN + 'wecomchan?sendkey=' + WECOMCHAN_SEND_KEY + '&msg_type=text' + '&to_user=' +
-                            WECOMCHAN_TO_USER + '&msg=' + 'EUserv续费日志\n\n' + desp)
-    if response.status_code != 200:
-        print('wecomchan 推送失败')
-    else:
-        print('wecomchan 推送成功')
+# 推送到所有已配置的渠道
+def push():
+    core.send('EUserv续费日志', desp)
 
 
 def main_handler(event, context):
@@ -249,17 +192,7 @@ def main_handler(event, context):
         check(sessid, s)
         time.sleep(5)
     
-    # 防止 config.sh export TG_API_HOST="" 的情况
-    global TG_API_HOST
-    if TG_API_HOST == "":
-        TG_API_HOST = 'api.telegram.org'
-
-    # 五个通知渠道至少选取一个
-    SCKEY and server_chan()
-    COOL_PUSH_MODE and COOL_PUSH_SKEY and coolpush()
-    PUSH_PLUS_TOKEN and push_plus()
-    TG_BOT_TOKEN and TG_USER_ID and TG_API_HOST and telegram()
-    WECOMCHAN_DOMAIN and WECOMCHAN_SEND_KEY and WECOMCHAN_TO_USER and wecomchan()
+    push()
 
     print('*' * 30)
 
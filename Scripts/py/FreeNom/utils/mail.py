@@ -1,4 +1,6 @@
+import os
 import smtplib
+import threading
 import traceback
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -6,34 +8,87 @@ from jinja2 import FileSystemLoader, Environment, Template
 
 from . import settings
 
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+# 模板名: (文件修改时间, 编译后的模板)
+_templates = {}
+_templates_lock = threading.Lock()
+
 
 class EmailPoster(object):
     """
     邮件发送基础类
 
+    同一个实例复用 SMTP 连接, 连接断开时自动重连;
+    send_many() 或 with 语句内的多次发送只握手、登录一次
+
     """
 
+    def __init__(self):
+        self.smtp = None
+        self.keep = False
+
     @staticmethod
-    def get_template():
-        loader = FileSystemLoader('templates')
-        env = Environment(loader=loader)
-        template = env.get_template("default.html")
-        return template
+    def get_template(name="default.html"):
+        """
+        编译后的模板按文件修改时间缓存, 模板文件改动后自动重新编译
+        """
+        mtime = os.path.getmtime(os.path.join(TEMPLATE_DIR, name))
+        with _templates_lock:
+            cached = _templates.get(name)
+            if cached and cached[0] == mtime:
+                return cached[1]
+            template = _env.get_template(name)
+            _templates[name] = (mtime, template)
+            return template
 
-    def send(self, data: dict):
+    def connect(self):
+        smtp = smtplib.SMTP_SSL(settings.MAIL_HOST, settings.MAIL_PORT)
+        # smtp.set_debuglevel(1)
+        smtp.ehlo()
+        smtp.login(settings.MAIL_USER, settings.MAIL_PW)
+        self.smtp = smtp
+        return smtp
+
+    def close(self):
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+        self.smtp = None
+
+    def __enter__(self):
+        self.keep = True
+        return self
+
+    def __exit__(self, *args):
+        self.keep = False
+        self.close()
+
+    def render(self, data: dict):
         payload = data.get("payload", {})
         if payload:
-            template = self.get_template()
-            content = template.render(payload=payload)
-        else:
-            content = data.get('body', '')
+            return self.get_template().render(payload=payload)
+        return data.get('body', '')
+
+    def send(self, data: dict):
+        content = self.render(data)
         subject = data.get('subject', '')
         mail_to = data.get('to', [])
         mail_from = data.get('from', settings.MAIL_ADDRESS)
-        self._send(content, subject, mail_from, mail_to)
+        return self._send(content, subject, mail_from, mail_to)
 
-    @staticmethod
-    def _send(content: str, subject: str, mail_from: str, mail_to: list):
+    def send_many(self, items: list):
+        """
+        在同一个 SMTP 会话中依次发送多封邮件, 返回每封是否成功
+        """
+        with self:
+            return [self.send(data) for data in items]
+
+    def _send(self, content: str, subject: str, mail_from: str, mail_to: list):
         msg_root = MIMEMultipart('related')
         msg_text = MIMEText(content, 'html', 'utf-8')
         msg_root.attach(msg_text)
@@ -42,11 +97,18 @@ class EmailPoster(object):
         msg_root['To'] = ";".join(mail_to)
 
         try:
-            smtp = smtplib.SMTP_SSL(settings.MAIL_HOST, settings.MAIL_PORT)
-            # smtp.set_debuglevel(1)
-            smtp.ehlo()
-            smtp.login(settings.MAIL_USER, settings.MAIL_PW)
-            smtp.sendmail(settings.MAIL_ADDRESS, mail_to, msg_root.as_string())
-            smtp.quit()
-        except Exception as e:
-            print(traceback.format_exc(e))
+            try:
+                smtp = self.smtp or self.connect()
+                smtp.sendmail(settings.MAIL_ADDRESS, mail_to, msg_root.as_string())
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # 复用的连接可能已被服务器关闭, 重连后再发一次
+                self.close()
+                self.connect().sendmail(settings.MAIL_ADDRESS, mail_to, msg_root.as_string())
+            return True
+        except Exception:
+            print(traceback.format_exc())
+            self.close()
+            return False
+        finally:
+            if not self.keep:
+                self.close()
@@ -566,6 +566,7 @@ class Heytap:
     def main(self):
         i = 1
         for config in self.login:
+            self.log += f'【账号{i}】\n'  # 推送时按此标签拆分给对应的接收人
             self.HT_cookies = config['cookies']
             self.HT_UserAgent = config['UserAgent']
             self.if_draw = config['if_draw']
@@ -8,6 +8,7 @@ import re
 import json
 import requests
 import urllib.parse
+from notifier import wecom
 
 sckey = os.getenv('PUSH_KEY')
 pptoken = os.getenv('PUSH_PLUS_TOKEN')
@@ -24,31 +25,20 @@ errorNotify = ""
 if not title:
     raise Exception("未设置 `TITLE[name]` Actions Secret!")
 
-def exwechat_get_access_token():
-    url = 'https://qyapi.weixin.qq.com/cgi-bin/gettoken'
-    params = {
-        'corpid': corpid,
-        'corpsecret': corpsecret
-    }
-    resp = requests.get(url, params=params)
-    resp.raise_for_status()
-    resp_json = resp.json()
-    if 'access_token' in resp_json.keys():
-        return resp_json['access_token']
-    else:
-        raise Exception('请检查CORPID和CORPSECRET是否正确！\n' + resp.text)
+def exwechat_get_access_token(force=False):
+    # access_token 缓存于内存和文件, 有效期内不再请求 gettoken
+    return wecom.get_access_token(corpid, corpsecret, force=force)
 
 def exwechat_get_ShortTimeMedia(img_url):
+    # media_id 按图片地址和 ETag/Last-Modified 缓存 3 天, 未命中时边下载边上传
     if img_url:
-        media_url = f'https://qyapi.weixin.qq.com/cgi-bin/media/upload?access_token={access_token}&type=file'
-        f = requests.get(img_url).content
-        r = requests.post(media_url, files={'file': f}, json=True)
-        return r.json()['media_id']
+        return wecom.get_media_id(corpid, corpsecret, img_url)
     else:
         return ""
 
 
 def exwechat_send(title, digest, content):
+    global access_token
     url = 'https://qyapi.weixin.qq.com/cgi-bin/message/send?access_token=' + access_token
     data = {
         "touser": touser,
@@ -80,6 +70,12 @@ def exwechat_send(title, digest, content):
             "url": "https://github.com/HollowMan6/Wechat-Timed-Message/actions"}
     resp = requests.post(url, data=json.dumps(data))
     resp.raise_for_status()
+    if resp.json().get('errcode') in wecom.INVALID_TOKEN_ERRCODES:
+        print("企业微信 access_token 已失效, 重新获取")
+        access_token = exwechat_get_access_token(force=True)
+        url = 'https://qyapi.weixin.qq.com/cgi-bin/message/send?access_token=' + access_token
+        resp = requests.post(url, data=json.dumps(data))
+        resp.raise_for_status()
     return resp
 
 if sckey:
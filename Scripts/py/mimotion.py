@@ -21,7 +21,8 @@ pp                [PushPlus: push_plus_token]
 off               [关闭推送]
 '''
 
-import requests, time, re, json, random, os
+import requests, time, re, random, os
+from notifier import core
 
 now = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
 headers = {
@@ -143,24 +144,17 @@ def get_app_token(login_token):
     return app_token
 
 
+# 推送由 notifier 统一发送, 以下函数把 PKEY 转换为对应渠道的配置
+def notify(env, desp):
+    core.send('小米运动 步数修改', desp, env=env)
+
+
 # 推送 server 酱
 def push_wx(_sckey, desp=""):
     if _sckey == '':
         print("[注意] 未提供sckey，不进行推送！")
     else:
-        server_url = f"https://sc.ftqq.com/{_sckey}.send"
-        params = {
-            "text": '小米运动 步数修改',
-            "desp": desp
-        }
-
-        response = requests.get(server_url, params=params)
-        json_data = response.json()
-
-        if json_data['errno'] == 0:
-            print(f"[{now}] 推送成功。")
-        else:
-            print(f"[{now}] 推送失败：{json_data['errno']}({json_data['errmsg']})")
+        notify({"PUSH_KEY": _sckey}, desp)
 
 
 # 推送新 server 酱
@@ -168,19 +162,7 @@ def push_server(_sckey, desp=""):
     if _sckey == '':
         print("[注意] 未提供sckey，不进行微信推送！")
     else:
-        server_url = f"https://sctapi.ftqq.com/{_sckey}.send"
-        params = {
-            "title": '小米运动 步数修改',
-            "desp": desp
-        }
-
-        response = requests.get(server_url, params=params)
-        json_data = response.json()
-
-        if json_data['code'] == 0:
-            print(f"[{now}] 推送成功。")
-        else:
-            print(f"[{now}] 推送失败：{json_data['code']}({json_data['message']})")
+        notify({"PUSH_KEY": _sckey, "PUSH_KEY_TURBO": "true"}, desp)
 
 
 # 推送消息到 pushplus
@@ -188,20 +170,7 @@ def push_pushplus(token, content=""):
     if token == '':
         print("[注意] 未提供token，不进行pushplus推送！")
     else:
-        server_url = "http://www.pushplus.plus/send"
-        params = {
-            "token": token,
-            "title": '小米运动 步数修改',
-            "content": content
-        }
-
-        response = requests.get(server_url, params=params)
-        json_data = response.json()
-
-        if json_data['code'] == 200:
-            print(f"[{now}] 推送成功。")
-        else:
-            print(f"[{now}] 推送失败：{json_data['code']}({json_data['message']})")
+        notify({"PUSH_PLUS_TOKEN": token}, content)
 
 
 # 推送消息到 TG
@@ -211,75 +180,19 @@ def push_tg(token, chat_id, desp=""):
     elif chat_id == '':
         print("[注意] 未提供chat_id，不进行tg推送！")
     else:
-        server_url = f"https://api.telegram.org/bot{token}/sendmessage"
-        params = {
-            "text": '小米运动 步数修改\n\n' + desp,
-            "chat_id": chat_id
-        }
-
-        response = requests.get(server_url, params=params)
-        json_data = response.json()
-
-        if json_data['ok']:
-            print(f"[{now}] 推送成功。")
-        else:
-            print(f"[{now}] 推送失败：{json_data['error_code']}({json_data['description']})")
+        notify({"TG_BOT_TOKEN": token, "TG_USER_ID": chat_id}, desp)
 
 
 # 企业微信推送
 def wxpush(msg, usr, corpid, corpsecret, agentid=1000002):
-    base_url = 'https://qyapi.weixin.qq.com/cgi-bin/gettoken?'
-    req_url = 'https://qyapi.weixin.qq.com/cgi-bin/message/send?access_token='
-    corpid = corpid
-    corpsecret = corpsecret
-    agentid = agentid
-
     if agentid == 0:
         agentid = 1000002
-
-    # 获取 access_token，每次的 access_token 都不一样，所以需要运行一次请求一次
-    def get_access_token(_base_url, _corpid, _corpsecret):
-        urls = _base_url + 'corpid=' + _corpid + '&corpsecret=' + _corpsecret
-        resp = requests.get(urls).json()
-        access_token = resp['access_token']
-        return access_token
-
-    def send_message(_msg, _usr):
-        data = get_message(_msg, _usr)
-        req_urls = req_url + get_access_token(base_url, corpid, corpsecret)
-        res = requests.post(url=req_urls, data=data)
-        ret = res.json()
-        if ret["errcode"] == 0:
-            print(f"[{now}] 企业微信推送成功")
-        else:
-            print(f"[{now}] 推送失败：{ret['errcode']} 错误信息：{ret['errmsg']}")
-
-    def get_message(_msg, _usr):
-        data = {
-            "touser": _usr,
-            "toparty": "@all",
-            "totag": "@all",
-            "msgtype": "text",
-            "agentid": agentid,
-            "text": {
-                "content": _msg
-            },
-            "safe": 0,
-            "enable_id_trans": 0,
-            "enable_duplicate_check": 0,
-            "duplicate_check_interval": 1800
-        }
-        data = json.dumps(data)
-        return data
-
-    msg = msg
-    usr = usr
     if corpid == '':
         print("[注意] 未提供corpid，不进行企业微信推送！")
     elif corpsecret == '':
         print("[注意] 未提供corpsecret，不进行企业微信推送！")
     else:
-        send_message(msg, usr)
+        notify({"QYWX_AM": f"{corpid},{corpsecret},{usr},{agentid}"}, msg)
 
 
 if __name__ ==  "__main__":
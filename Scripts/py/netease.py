@@ -22,6 +22,7 @@ env
 "ding_token": os.getenv('DD_BOT_TOKEN')
 ------------
 pip3 install requests==2.24.0 pycryptodome==3.9.8 
+云函数部署: python -m notifier.scf netease.py 打包后上传 zip, notifier 会一起上传
 """
 
 import os
@@ -34,6 +35,7 @@ import argparse
 import hashlib
 from Crypto.Cipher import AES
 import json
+from notifier import core
 
 
 # Get the arguments input.
@@ -105,143 +107,47 @@ def rsa_encrypt(text, pub_key, modulus):
     return format(rs, "x").zfill(256)
 
 
-# 推送类，包含所有推送函数
+# 推送类，推送配置转换为 notifier 的变量名后交给 notifier.core 发送
 class Push:
     def __init__(self, text, args):
         self.text = text
         self.info = args
 
-    # 执行指定的推送流程
+    # 命令行参数为列表, 环境变量为字符串
+    @staticmethod
+    def first(value):
+        return value[0] if isinstance(value, list) else value
+
+    # 转换为 notifier.channels 使用的变量名
+    def env(self):
+        info = self.info
+        env = {}
+        if info["sc_key"]:
+            env["PUSH_KEY"] = self.first(info["sc_key"])
+            env["PUSH_KEY_TURBO"] = "true"
+        if info["tg_bot_key"] and all(info["tg_bot_key"]):
+            env["TG_BOT_TOKEN"], env["TG_USER_ID"] = info["tg_bot_key"]
+        if info["bark_key"]:
+            env["BARK"] = self.first(info["bark_key"])
+        if info["push_plus_key"]:
+            env["PUSH_PLUS_TOKEN"] = self.first(info["push_plus_key"])
+        wecom_key = info["wecom_key"]
+        if wecom_key and wecom_key[0] and wecom_key[1]:
+            if wecom_key[0].startswith("http"):
+                # 环境变量: wecomchan 的域名, SendKey, 接收人
+                env["WECOMCHAN_DOMAIN"], env["WECOMCHAN_SEND_KEY"], env["WECOMCHAN_TO_USER"] = wecom_key
+            else:
+                # 命令行: 企业ID, AgentID, Secret
+                env["QYWX_AM"] = "{0},{2},@all,{1}".format(*wecom_key)
+        if info["qmsg_key"]:
+            env["QQ_SKEY"] = self.first(info["qmsg_key"])
+        if info["ding_token"]:
+            env["DD_BOT_TOKEN"] = self.first(info["ding_token"])
+        return env
+
+    # 执行推送
     def do_push(self):
-        # ServerChan
-        try:
-            self.server_chan_push()
-        except Exception as err:
-            print(err)
-        # Bark
-        try:
-            self.bark_push()
-        except Exception as err:
-            print(err)
-        # Telegram
-        try:
-            self.telegram_push()
-        except Exception as err:
-            print(err)
-        # pushplus
-        try:
-            self.push_plus_push()
-        except Exception as err:
-            print(err)
-        # 企业微信
-        try:
-            self.wecom_id_push()
-        except Exception as err:
-            print(err)
-        # Qmsg
-        try:
-            self.qmsg_push()
-        except Exception as err:
-            print(err)
-        # Ding
-        try:
-            self.ding_talk_push()
-        except Exception as err:
-            print(err)
-
-    # Server Chan Turbo Push
-    def server_chan_push(self):
-        if not self.info["sc_key"]:
-            return
-        arg = self.info["sc_key"]
-        url = "https://sctapi.ftqq.com/{0}.send".format(arg[0])
-        headers = {"Content-type": "application/x-www-form-urlencoded"}
-        content = {"title": "网易云打卡", "desp": self.text}
-        ret = requests.post(url, headers=headers, data=content)
-        print("ServerChan: " + ret.text)
-
-    # Telegram Bot Push
-    def telegram_push(self):
-        if not self.info["tg_bot_key"]:
-            return
-        arg = self.info["tg_bot_key"]
-        url = "https://api.telegram.org/bot{0}/sendMessage".format(arg[0])
-        data = {
-            "chat_id": arg[1],
-            "text": self.text,
-        }
-        ret = requests.post(url, data=data)
-        print("Telegram: " + ret.text)
-
-    # Bark Push
-    def bark_push(self):
-        if not self.info["bark_key"]:
-            return
-        arg = self.info["bark_key"]
-        data = {"title": "网易云打卡", "body": self.text}
-        headers = {"Content-Type": "application/json;charset=utf-8"}
-        url = "https://api.day.app/{0}/?isArchive={1}".format(arg[0], arg[1])
-        ret = requests.post(url, json=data, headers=headers)
-        print("Bark: " + ret.text)
-
-    # PushPlus Push
-    def push_plus_push(self):
-        if not self.info["push_plus_key"]:
-            return
-        arg = self.info["push_plus_key"]
-        url = "http://www.pushplus.plus/send?token={0}&title={1}&content={2}&template={3}".format(
-            arg[0], "网易云打卡", self.text, "html"
-        )
-        ret = requests.get(url)
-        print("pushplus: " + ret.text)
-
-    # Wecom Push
-    def wecom_id_push(self):
-        if not self.info["wecom_key"]:
-            return
-        arg = self.info["wecom_key"]
-        body = {
-            "touser": "@all",
-            "msgtype": "text",
-            "agentid": arg[1],
-            "text": {"content": self.text},
-            "safe": 0,
-            "enable_id_trans": 0,
-            "enable_duplicate_check": 0,
-            "duplicate_check_interval": 1800,
-        }
-        access_token = requests.get(
-            "https://qyapi.weixin.qq.com/cgi-bin/gettoken?corpid={0}&corpsecret={1}".format(str(arg[0]), arg[2])
-        ).json()["access_token"]
-        res = requests.post(
-            "https://qyapi.weixin.qq.com/cgi-bin/message/send?access_token={0}".format(access_token),
-            data=json.dumps(body),
-        )
-        ret = res.json()
-        if ret["errcode"] != 0:
-            print("微信推送配置错误")
-        else:
-            print("Wecom: " + ret)
-
-    # Qmsg Push
-    def qmsg_push(self):
-        if not self.info["qmsg_key"]:
-            return
-        arg = self.info["qmsg_key"]
-        url = "https://qmsg.zendee.cn/send/{0}?msg={1}".format(arg[0], self.text)
-        ret = requests.post(url)
-        print("Qmsg: " + ret.text)
-
-    # Ding Talk Push
-    def ding_talk_push(self):
-        if not self.info["ding_token"]:
-            return
-        arg = self.info["ding_token"]
-        url = "https://oapi.dingtalk.com/robot/send?access_token={0}".format(arg[0])
-        header = {"Content-Type": "application/json"}
-        data = json.dumps({"msgtype": "text", "text": {"content": "【CMLU】\n\n" + self.text}})
-        ret = requests.post(url, headers=header, data=data)
-        print("Ding: " + ret.text)
+        core.send("网易云打卡", self.text, env=self.env())
 
 
 # 加密类，实现网易云音乐前端加密流程
@@ -0,0 +1,68 @@
+import asyncio
+import weakref
+
+import aiohttp
+
+from . import settings, transport
+
+# 每个事件循环一个 ClientSession
+_sessions = weakref.WeakKeyDictionary()
+
+
+def get_session():
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit_per_host=settings.NOTIFY_POOL_SIZE)
+        session = aiohttp.ClientSession(connector=connector)
+        _sessions[loop] = session
+    return session
+
+
+async def fetch(method, url, params=None, data=None, json=None, headers=None, proxies=None, timeout=None):
+    """
+    与 transport.request 参数一致的异步请求, 返回 (status, headers, json), 非 json 响应时 json 为 None
+    """
+    if timeout is None:
+        timeout = aiohttp.ClientTimeout(sock_connect=settings.NOTIFY_CONNECT_TIMEOUT,
+                                        sock_read=settings.NOTIFY_READ_TIMEOUT)
+    else:
+        timeout = aiohttp.ClientTimeout(total=timeout)
+    if settings.NOTIFY_API_BASE:
+        url, headers = transport.redirect(url, headers)
+        proxies = None
+    proxy = None
+    if proxies:
+        proxy = proxies.get("https") or proxies.get("http")
+    async with get_session().request(method, url, params=params, data=data, json=json, headers=headers,
+                                     proxy=proxy, timeout=timeout) as response:
+        try:
+            body = await response.json(content_type=None)
+        except ValueError:
+            body = None
+        return response.status, response.headers, body
+
+
+async def request(method, url, **kwargs):
+    """
+    返回解析后的 json
+    """
+    status, headers, body = await fetch(method, url, **kwargs)
+    if body is None:
+        raise ValueError(f"{url} 返回的不是 json, 状态码 {status}")
+    return body
+
+
+async def get(url, params=None, **kwargs):
+    return await request("GET", url, params=params, **kwargs)
+
+
+async def post(url, data=None, json=None, **kwargs):
+    return await request("POST", url, data=data, json=json, **kwargs)
+
+
+async def close():
+    loop = asyncio.get_running_loop()
+    session = _sessions.pop(loop, None)
+    if session is not None:
+        await session.close()
@@ -0,0 +1,165 @@
+import io
+import os
+import tempfile
+import uuid
+
+from . import coalesce
+from . import settings
+
+# 支持以附件发送的渠道
+SUPPORTED = ("telegram_bot", "wecom_app")
+# 附件消息附带的正文预览长度
+PREVIEW_CHARS = 200
+BLOCK_SIZE = 64 * 1024
+
+
+def enabled():
+    return settings.NOTIFY_ATTACH == "true"
+
+
+def oversized(channel, title, content):
+    """
+    正文超过渠道单条消息上限且该渠道支持附件
+    """
+    if not enabled() or channel not in SUPPORTED:
+        return False
+    limit, unit = coalesce.CHANNEL_LIMITS[channel]
+    return coalesce.text_size(f"{title}\n\n{content}", unit) > limit
+
+
+def preview(title, content, chars=PREVIEW_CHARS):
+    text = content.strip()
+    if len(text) > chars:
+        text = text[:chars] + "……"
+    return f"{title}\n\n{text}\n\n(完整内容见附件)"
+
+
+def file_name(title):
+    name = "".join("_" if ch in '\\/:*?"<>|\n' else ch for ch in title).strip() or "notify"
+    return f"{name[:50]}.txt"
+
+
+def write_temp(content):
+    """
+    正文写入临时文件, 上传时从文件按块读取
+    """
+    f = tempfile.NamedTemporaryFile("w", encoding="utf-8", prefix="notify_", suffix=".txt", delete=False)
+    with f:
+        f.write(content)
+    return f.name
+
+
+def multipart_frame(boundary, fields, file_field, filename, content_type):
+    """
+    文件内容前后的 multipart 片段, 返回 (head, tail)
+    """
+    head = io.BytesIO()
+    for name, value in fields.items():
+        head.write(f"--{boundary}\r\n"
+                   f"Content-Disposition: form-data; name=\"{name}\"\r\n\r\n"
+                   f"{value}\r\n".encode("utf-8"))
+    head.write(f"--{boundary}\r\n"
+               f"Content-Disposition: form-data; name=\"{file_field}\"; filename=\"{filename}\"\r\n"
+               f"Content-Type: {content_type}\r\n\r\n".encode("utf-8"))
+    return head.getvalue(), f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+
+class MultipartStream(object):
+    """
+    multipart/form-data 请求体, 文件部分从磁盘按块读取而不是拼成一个大字符串
+
+    可直接作为 requests 的 data, rewind() 后可重发, discard() 删除临时文件
+    """
+
+    def __init__(self, fields, file_field, path, filename, content_type="text/plain; charset=utf-8"):
+        self.boundary = uuid.uuid4().hex
+        self.head, self.tail = multipart_frame(self.boundary, fields, file_field, filename, content_type)
+        self.path = path
+        self.length = len(self.head) + os.path.getsize(path) + len(self.tail)
+        self.file = None
+        self.rewind()
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    @property
+    def headers(self):
+        return {"Content-Type": self.content_type, "Content-Length": str(self.length)}
+
+    def rewind(self):
+        if self.file:
+            self.file.close()
+        self.file = open(self.path, "rb")
+        self.parts = [io.BytesIO(self.head), self.file, io.BytesIO(self.tail)]
+        self.position = 0
+
+    def __len__(self):
+        return self.length
+
+    def tell(self):
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length
+        data = b""
+        while self.parts and len(data) < size:
+            chunk = self.parts[0].read(size - len(data))
+            if not chunk:
+                self.parts.pop(0)
+                continue
+            data += chunk
+        self.position += len(data)
+        return data
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(BLOCK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class PipeMultipartStream(object):
+    """
+    文件部分来自 chunks 迭代器(如下载中的响应)的 multipart 请求体, 边读边发, 只能发送一次
+
+    size 为文件部分的字节数, 用于计算 Content-Length
+    """
+
+    def __init__(self, fields, file_field, chunks, size, filename, content_type="application/octet-stream"):
+        self.boundary = uuid.uuid4().hex
+        self.head, self.tail = multipart_frame(self.boundary, fields, file_field, filename, content_type)
+        self.chunks = chunks
+        self.length = len(self.head) + size + len(self.tail)
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    @property
+    def headers(self):
+        return {"Content-Type": self.content_type, "Content-Length": str(self.length)}
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        yield self.head
+        for chunk in self.chunks:
+            if chunk:
+                yield chunk
+        yield self.tail
@@ -0,0 +1,188 @@
+"""
+推送吞吐量压测, 启动 notifier.fakeserver 后用 sendNotify.send() 等接口推送, 不会访问真实平台
+
+python -m notifier.bench --messages 200 --parallel 4 --mode send concurrent async --ratelimit 0.05
+报告每种模式的 msgs/s、单次 send 与单渠道推送的 p50/p99 延迟、服务端收到的连接数和请求数
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import fakeserver
+
+MODES = ("send", "concurrent", "async", "coalesce")
+
+# 压测使用的渠道配置, 请求由 NOTIFY_API_BASE 改发到 fakeserver
+BENCH_ENV = {
+    "BARK": "bench",
+    "PUSH_KEY": "SCTbench",
+    "TG_BOT_TOKEN": "bench",
+    "TG_USER_ID": "1",
+    "DD_BOT_TOKEN": "bench",
+    "DD_BOT_SECRET": "bench",
+    "QQ_SKEY": "bench",
+    "PUSH_PLUS_TOKEN": "bench",
+    "QYWX_AM": "bench,bench,@all,1000002",
+    "WECOMCHAN_DOMAIN": "http://wecomchan.local/",
+    "WECOMCHAN_SEND_KEY": "bench",
+    "COOL_PUSH_SKEY": "bench",
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = max(int(round(pct / 100.0 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def prepare_env(server, args):
+    """
+    在导入 notifier.settings 之前设置环境变量, 隔离缓存目录并关闭 outbox、去重
+    """
+    from . import channels
+    names = args.channels or list(channels.CHANNELS)
+    for name, (module, required, label) in channels.CHANNELS.items():
+        for key in required:
+            os.environ.pop(key, None)
+        if name in names:
+            os.environ.update({key: BENCH_ENV[key] for key in required})
+    if "dingding_bot" in names:
+        os.environ["DD_BOT_SECRET"] = BENCH_ENV["DD_BOT_SECRET"]
+    os.environ["NOTIFY_API_BASE"] = server.url
+    os.environ["NOTIFY_CACHE_DIR"] = tempfile.mkdtemp(prefix="notify_bench_")
+    os.environ["NOTIFY_OUTBOX"] = "false"
+    os.environ["NOTIFY_DEDUP_TTL"] = "0"
+    os.environ["NOTIFY_METRICS"] = "false"
+    if not args.keep_limits:
+        os.environ["NOTIFY_RATE_LIMITS"] = ",".join(f"{i}=1000000/1" for i in channels.CHANNELS)
+
+
+def run_sync(send, messages, content, parallel):
+    latencies = []
+    results = []
+
+    def one(i):
+        start = time.time()
+        result = send(f"bench {i}", f"{i} {content}")
+        latencies.append(time.time() - start)
+        results.extend(result or [])
+
+    if parallel > 1:
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            list(executor.map(one, range(messages)))
+    else:
+        for i in range(messages):
+            one(i)
+    return latencies, results
+
+
+def run_async(send_async, messages, content, parallel):
+    from . import aio
+    latencies = []
+    results = []
+
+    async def one(i, semaphore):
+        async with semaphore:
+            start = time.time()
+            result = await send_async(f"bench {i}", f"{i} {content}")
+            latencies.append(time.time() - start)
+            results.extend(result or [])
+
+    async def run():
+        semaphore = asyncio.Semaphore(parallel)
+        await asyncio.gather(*[one(i, semaphore) for i in range(messages)])
+        await aio.close()
+
+    asyncio.run(run())
+    return latencies, results
+
+
+def bench(mode, server, args):
+    import sendNotify
+    from notifier import core, settings, transport
+    settings.NOTIFY_CONCURRENT = "true" if mode == "concurrent" else ""
+    settings.NOTIFY_COALESCE = "true" if mode == "coalesce" else ""
+    # 每种模式从空连接池开始, 服务端统计的连接数才有可比性
+    transport.close()
+    server.stats.reset()
+    content = "x" * args.size
+    start = time.time()
+    if mode == "async":
+        latencies, results = run_async(sendNotify.send_async, args.messages, content, args.parallel)
+    else:
+        latencies, results = run_sync(sendNotify.send, args.messages, content, args.parallel)
+        if mode == "coalesce":
+            results = core.get_coalescer().flush() or []
+    elapsed = time.time() - start
+    pushes = [i.elapsed for i in results]
+    statuses = {}
+    for i in results:
+        statuses[i.status] = statuses.get(i.status, 0) + 1
+    return {
+        "mode": mode,
+        "messages": args.messages,
+        "elapsed": round(elapsed, 3),
+        "msgs_per_sec": round(args.messages / elapsed, 2) if elapsed else 0.0,
+        "pushes_per_sec": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "send_p50": round(percentile(latencies, 50), 4),
+        "send_p99": round(percentile(latencies, 99), 4),
+        "push_p50": round(percentile(pushes, 50), 4),
+        "push_p99": round(percentile(pushes, 99), 4),
+        "statuses": statuses,
+        "server": server.stats.snapshot(),
+    }
+
+
+def report(row):
+    print(f"\n[{row['mode']}] {row['messages']} 条, 耗时 {row['elapsed']}s")
+    print(f"  msgs/s {row['msgs_per_sec']}  pushes/s {row['pushes_per_sec']}")
+    print(f"  send   p50 {row['send_p50'] * 1000:.1f}ms  p99 {row['send_p99'] * 1000:.1f}ms")
+    print(f"  push   p50 {row['push_p50'] * 1000:.1f}ms  p99 {row['push_p99'] * 1000:.1f}ms")
+    print(f"  结果   {row['statuses']}")
+    server = row["server"]
+    print(f"  服务端 连接 {server['connections']}  请求 {server['requests']}  {server['outcomes']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推送吞吐量压测")
+    parser.add_argument("--messages", type=int, default=100, help="每种模式推送的条数")
+    parser.add_argument("--parallel", type=int, default=1, help="同时调用 send 的数量")
+    parser.add_argument("--size", type=int, default=200, help="每条内容的长度")
+    parser.add_argument("--mode", nargs="+", choices=MODES, default=["send", "concurrent", "async"])
+    parser.add_argument("--channels", nargs="+", default=None, help="参与压测的渠道, 默认全部")
+    parser.add_argument("--keep-limits", action="store_true", help="保留 ratelimit 的默认限流")
+    parser.add_argument("--json", action="store_true", help="以 json 输出结果")
+    parser.add_argument("--verbose", action="store_true", help="保留推送过程的输出")
+    fakeserver.add_arguments(parser)
+    args = parser.parse_args()
+
+    server = fakeserver.from_arguments(args).start()
+    prepare_env(server, args)
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    rows = []
+    devnull = open(os.devnull, "w")
+    try:
+        for mode in args.mode:
+            # 各渠道的 推送成功/失败 输出会淹没报告, --verbose 时才保留
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+                row = bench(mode, server, args)
+            rows.append(row)
+            if not args.json:
+                report(row)
+    finally:
+        devnull.close()
+        server.stop()
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import atexit
+import collections
+import os
+import tempfile
+import threading
+
+from . import settings
+
+
+class MessageBuffer(object):
+    """
+    只追加的日志缓冲
+
+    前 head 行常驻内存, 其余行超过 max_bytes 后从最旧的开始写入临时文件,
+    digest() 返回 首部 + 省略说明 + 末尾 tail 行, 供最终推送使用
+    临时文件在 clear() 或进程退出时删除
+    """
+
+    def __init__(self, max_bytes=None, head=None, tail=None):
+        self.max_bytes = settings.NOTIFY_BUFFER_BYTES if max_bytes is None else max_bytes
+        self.head_lines = settings.NOTIFY_BUFFER_HEAD if head is None else head
+        self.tail_lines = settings.NOTIFY_BUFFER_TAIL if tail is None else tail
+        self.head = []
+        self.body = collections.deque()
+        self.body_bytes = 0
+        self.spilled = 0
+        self.spill_file = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.head) + self.spilled + len(self.body)
+
+    def append(self, text):
+        with self.lock:
+            for line in str(text).split("\n"):
+                if len(self.head) < self.head_lines:
+                    self.head.append(line)
+                    continue
+                self.body.append(line)
+                self.body_bytes += len(line.encode("utf-8")) + 1
+                while self.body_bytes > self.max_bytes and len(self.body) > 1:
+                    self.spill(self.body.popleft())
+
+    def spill(self, line):
+        if self.spill_file is None:
+            self.spill_file = tempfile.NamedTemporaryFile("w+", encoding="utf-8", prefix="notify_",
+                                                          suffix=".log", delete=False)
+            atexit.register(self.discard)
+        self.spill_file.write(line + "\n")
+        self.body_bytes -= len(line.encode("utf-8")) + 1
+        self.spilled += 1
+
+    @property
+    def spill_path(self):
+        return self.spill_file.name if self.spill_file else ""
+
+    def digest(self):
+        """
+        推送用的摘要, 未溢出时即完整内容
+        """
+        with self.lock:
+            if not self.spilled and len(self.body) <= self.tail_lines:
+                return "\n".join(self.head + list(self.body))
+            tail = list(self.body)[-self.tail_lines:] if self.tail_lines else []
+            omitted = len(self) - len(self.head) - len(tail)
+            note = f"...... 省略 {omitted} 行 ......"
+            return "\n".join(self.head + [note] + tail)
+
+    def lines(self):
+        """
+        按顺序遍历全部内容, 包括已写入临时文件的部分
+        """
+        with self.lock:
+            head = list(self.head)
+            body = list(self.body)
+            path = self.spill_path
+            if self.spill_file:
+                self.spill_file.flush()
+        yield from head
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    yield line.rstrip("\n")
+        yield from body
+
+    def clear(self):
+        with self.lock:
+            self.head = []
+            self.body.clear()
+            self.body_bytes = 0
+            self.spilled = 0
+            self.discard()
+
+    def discard(self):
+        """
+        关闭并删除临时文件
+        """
+        if self.spill_file is None:
+            return
+        atexit.unregister(self.discard)
+        self.spill_file.close()
+        try:
+            os.remove(self.spill_file.name)
+        except OSError:
+            pass
+        self.spill_file = None
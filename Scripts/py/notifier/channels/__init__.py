@@ -0,0 +1,71 @@
+import importlib
+import os
+
+# 渠道名: (实现模块, 必填的环境变量, 显示名)
+# 只有必填变量都不为空时才会导入对应模块
+CHANNELS = {
+    "bark": ("bark", ("BARK",), "bark"),
+    "sc_key": ("serverchan", ("PUSH_KEY",), "Server酱"),
+    "telegram_bot": ("telegram", ("TG_BOT_TOKEN", "TG_USER_ID"), "Telegram"),
+    "dingding_bot": ("dingtalk", ("DD_BOT_TOKEN",), "钉钉机器人"),
+    "coolpush_bot": ("qmsg", ("QQ_SKEY",), "QQ机器人"),
+    "pushplus_bot": ("pushplus", ("PUSH_PLUS_TOKEN",), "PUSHPLUS"),
+    "wecom_app": ("wecom_app", ("QYWX_AM",), "企业微信应用"),
+    "wecomchan": ("wecomchan", ("WECOMCHAN_DOMAIN", "WECOMCHAN_SEND_KEY"), "wecomchan"),
+    "xuthus_coolpush": ("coolpush", ("COOL_PUSH_SKEY",), "酷推"),
+}
+
+
+def register(name, module, required, label=None):
+    """
+    注册渠道插件, module 为 notifier.channels 下的模块名或完整模块路径
+
+    模块需提供 configure(env) 和 request(config, title, content) / check(response),
+    或自行实现 send(config, title, content, post)
+    """
+    CHANNELS[name] = (module, tuple(required), label or name)
+
+
+def configured(env=None):
+    """
+    必填变量齐全的渠道名, 不导入任何渠道模块
+    """
+    env = os.environ if env is None else env
+    return [name for name, (_, required, _) in CHANNELS.items() if all(env.get(key) for key in required)]
+
+
+def load(name):
+    module = CHANNELS[name][0]
+    if "." not in module:
+        module = f"{__name__}.{module}"
+    return importlib.import_module(module)
+
+
+class Channel(object):
+    def __init__(self, name, backend, config):
+        self.name = name
+        self.backend = backend
+        self.config = config
+        self.label = CHANNELS[name][2]
+
+    def with_config(self, **overrides):
+        return Channel(self.name, self.backend, dict(self.config, **overrides))
+
+    def __repr__(self):
+        return f"Channel({self.name})"
+
+
+def enabled(env=None):
+    """
+    按 env (默认 os.environ) 加载并配置已启用的渠道
+    """
+    env = os.environ if env is None else env
+    result = []
+    for name in configured(env):
+        backend = load(name)
+        config = backend.configure(env)
+        if config is None:
+            print(f"{CHANNELS[name][2]} 配置错误, 已跳过")
+            continue
+        result.append(Channel(name, backend, config))
+    return result
@@ -0,0 +1,17 @@
+import urllib.parse
+
+
+def configure(env):
+    key = env["BARK"]
+    # 以 http 开头时视为自建 bark 服务
+    base = key.rstrip("/") if key.startswith("http") else f"https://api.day.app/{key}"
+    return {"base": base}
+
+
+def request(config, title, content):
+    return {"method": "GET",
+            "url": f"{config['base']}/{urllib.parse.quote(title, safe='')}/{urllib.parse.quote_plus(content)}"}
+
+
+def check(response):
+    return response["code"] == 200
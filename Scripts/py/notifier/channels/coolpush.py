@@ -0,0 +1,14 @@
+import json
+
+
+def configure(env):
+    return {"key": env["COOL_PUSH_SKEY"], "mode": env.get("COOL_PUSH_MODE") or "send"}
+
+
+def request(config, title, content):
+    return {"method": "POST", "url": f"https://push.xuthus.cc/{config['mode']}/{config['key']}",
+            "data": json.dumps({"c": f"{title}\n\n{content}"})}
+
+
+def check(response):
+    return response.get("code") == 200
@@ -0,0 +1,32 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+import urllib.parse
+
+
+def configure(env):
+    return {"token": env["DD_BOT_TOKEN"], "secret": env.get("DD_BOT_SECRET", "")}
+
+
+def request(config, title, content):
+    url = f"https://oapi.dingtalk.com/robot/send?access_token={config['token']}"
+    # 未设置 DD_BOT_SECRET 时不加签
+    if config["secret"]:
+        timestamp = str(round(time.time() * 1000))  # 时间戳
+        string_to_sign = "{}\n{}".format(timestamp, config["secret"])
+        hmac_code = hmac.new(config["secret"].encode("utf-8"), string_to_sign.encode("utf-8"),
+                             digestmod=hashlib.sha256).digest()
+        sign = urllib.parse.quote_plus(base64.b64encode(hmac_code))  # 签名
+        url += f"&timestamp={timestamp}&sign={sign}"
+    data = {
+        "msgtype": "text",
+        "text": {"content": f"{title}\n\n{content}"}
+    }
+    return {"method": "POST", "url": url, "headers": {"Content-Type": "application/json;charset=utf-8"},
+            "data": json.dumps(data)}
+
+
+def check(response):
+    return not response["errcode"]
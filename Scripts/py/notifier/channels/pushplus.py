@@ -0,0 +1,17 @@
+def configure(env):
+    return {"token": env["PUSH_PLUS_TOKEN"], "topic": env.get("PUSH_PLUS_TOPIC", "")}
+
+
+def request(config, title, content):
+    data = {
+        "token": config["token"],
+        "title": title,
+        "content": content
+    }
+    if config["topic"]:
+        data["topic"] = config["topic"]
+    return {"method": "POST", "url": "http://www.pushplus.plus/send", "json": data}
+
+
+def check(response):
+    return response["code"] == 200
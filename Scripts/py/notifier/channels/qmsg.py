@@ -0,0 +1,11 @@
+def configure(env):
+    return {"key": env["QQ_SKEY"], "mode": env.get("QQ_MODE") or "send"}
+
+
+def request(config, title, content):
+    return {"method": "POST", "url": f"https://qmsg.zendee.cn/{config['mode']}/{config['key']}",
+            "params": {"msg": f"{title}\n\n{content}"}}
+
+
+def check(response):
+    return response["code"] == 0
@@ -0,0 +1,19 @@
+def configure(env):
+    key = env["PUSH_KEY"]
+    # SCT 开头的是 Server酱 Turbo 的 SendKey
+    turbo = key.startswith("SCT") or env.get("PUSH_KEY_TURBO") == "true"
+    return {"key": key, "turbo": turbo}
+
+
+def request(config, title, content):
+    desp = content.replace("\n", "\n\n")
+    if config["turbo"]:
+        return {"method": "POST", "url": f"https://sctapi.ftqq.com/{config['key']}.send",
+                "data": {"title": title, "desp": desp}}
+    return {"method": "POST", "url": f"https://sc.ftqq.com/{config['key']}.send",
+            "data": {"text": title, "desp": desp}}
+
+
+def check(response):
+    # 旧版返回 errno, Turbo 版返回 code
+    return response.get("errno", response.get("code")) == 0
@@ -0,0 +1,30 @@
+from .. import attach
+
+
+def configure(env):
+    host = env.get("TG_API_HOST") or "api.telegram.org"
+    base = host.rstrip("/") if "http" in host else f"https://{host}"
+    proxies = None
+    if env.get("TG_PROXY_IP") and env.get("TG_PROXY_PORT"):
+        proxy = "http://{}:{}".format(env["TG_PROXY_IP"], env["TG_PROXY_PORT"])
+        proxies = {"http": proxy, "https": proxy}
+    return {"base": f"{base}/bot{env['TG_BOT_TOKEN']}", "chat_id": str(env["TG_USER_ID"]), "proxies": proxies}
+
+
+def request(config, title, content):
+    # 超过单条消息上限时整体作为文件发送
+    if attach.oversized("telegram_bot", title, content):
+        return document_request(config, title, content)
+    payload = {"chat_id": config["chat_id"], "text": f"{title}\n\n{content}", "disable_web_page_preview": True}
+    return {"method": "POST", "url": f"{config['base']}/sendMessage", "json": payload, "proxies": config["proxies"]}
+
+
+def document_request(config, title, content):
+    fields = {"chat_id": config["chat_id"], "caption": attach.preview(title, content)}
+    stream = attach.MultipartStream(fields, "document", attach.write_temp(content), attach.file_name(title))
+    return {"method": "POST", "url": f"{config['base']}/sendDocument", "data": stream, "headers": stream.headers,
+            "proxies": config["proxies"]}
+
+
+def check(response):
+    return response["ok"]
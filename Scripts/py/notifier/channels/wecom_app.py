@@ -0,0 +1,148 @@
+import json
+import re
+
+from .. import attach, transport, wecom
+
+SEND_URL = "https://qyapi.weixin.qq.com/cgi-bin/message/send?access_token="
+UPLOAD_URL = "https://qyapi.weixin.qq.com/cgi-bin/media/upload?access_token={}&type=file"
+
+
+def configure(env):
+    """
+    QYWX_AM: corpid,corpsecret,touser,agentid[,media_id]
+    media_id 为空或 1 时发送文本, 为 0 时发送文本卡片, 其他值作为图文消息的封面
+    """
+    values = re.split(",", env["QYWX_AM"])
+    if not 4 <= len(values) <= 5:
+        print("QYWX_AM 设置错误！！\n取消推送")
+        return None
+    values += [""] * (5 - len(values))
+    corpid, corpsecret, touser, agentid, media_id = values
+    return {"corpid": corpid, "corpsecret": corpsecret, "touser": touser or "@all", "agentid": agentid,
+            "media_id": media_id}
+
+
+def default_post(spec):
+    return transport.request(**spec).json()
+
+
+class WeCom:
+    """
+    企业微信应用消息, post(spec) 负责发出请求并返回 json, 默认直接使用 transport
+    """
+
+    def __init__(self, corpid, corpsecret, agentid, post=None):
+        self.CORPID = corpid
+        self.CORPSECRET = corpsecret
+        self.AGENTID = agentid
+        self.post = post or default_post
+
+    def get_access_token(self, force=False):
+        return wecom.get_access_token(self.CORPID, self.CORPSECRET, force=force)
+
+    def post_message(self, send_values):
+        def post(access_token):
+            return self.post({"method": "POST", "url": SEND_URL + access_token,
+                              "data": bytes(json.dumps(send_values), "utf-8")})
+        # token 缓存于内存和文件, 失效时自动刷新重试一次
+        respone = wecom.call_with_token(self.CORPID, self.CORPSECRET, post)
+        return respone["errmsg"]
+
+    def upload_media(self, content, filename):
+        """
+        content 作为临时素材上传, 返回接口的 json, 其中包含 media_id
+        """
+        def upload(access_token):
+            # 每次请求单独写临时文件, 发送后由 post 删除
+            stream = attach.MultipartStream({}, "media", attach.write_temp(content), filename)
+            try:
+                return self.post({"method": "POST", "url": UPLOAD_URL.format(access_token), "data": stream,
+                                  "headers": stream.headers})
+            finally:
+                stream.discard()
+        return wecom.call_with_token(self.CORPID, self.CORPSECRET, upload)
+
+    def send_attachment(self, title, message, touser="@all"):
+        data = self.upload_media(message, attach.file_name(title))
+        if not data.get("media_id"):
+            return data.get("errmsg", "上传文件失败")
+        errmsg = self.post_message(self.text_values(attach.preview(title, message), touser))
+        if errmsg != "ok":
+            return errmsg
+        return self.post_message({
+            "touser": touser,
+            "msgtype": "file",
+            "agentid": self.AGENTID,
+            "file": {
+                "media_id": data["media_id"]
+            },
+            "safe": "0"
+        })
+
+    def text_values(self, message, touser="@all"):
+        return {
+            "touser": touser,
+            "msgtype": "text",
+            "agentid": self.AGENTID,
+            "text": {
+                "content": message
+            },
+            "safe": "0"
+        }
+
+    def textcard_values(self, title, message, touser="@all"):
+        return {
+            "touser": touser,
+            "msgtype": "textcard",
+            "agentid": self.AGENTID,
+            "textcard": {
+                "title": title,
+                "description": message,
+                "url": "https://github.com",
+                "btntxt": "详情"
+            },
+            "safe": "0"
+        }
+
+    def mpnews_values(self, title, message, media_id, touser="@all"):
+        return {
+            "touser": touser,
+            "msgtype": "mpnews",
+            "agentid": self.AGENTID,
+            "mpnews": {
+                "articles": [
+                    {
+                        "title": title,
+                        "thumb_media_id": media_id,
+                        "author": "Author",
+                        "content_source_url": "",
+                        "content": message.replace("\n", "<br/>"),
+                        "digest": message
+                    }
+                ]
+            }
+        }
+
+    def send_text(self, message, touser="@all"):
+        return self.post_message(self.text_values(message, touser))
+
+    def send_mpnews(self, title, message, media_id, touser="@all"):
+        return self.post_message(self.mpnews_values(title, message, media_id, touser))
+
+
+def send(config, title, content, post):
+    wx = WeCom(config["corpid"], config["corpsecret"], config["agentid"], post)
+    touser = config["touser"]
+    media_id = config["media_id"]
+    if media_id == "0":
+        errmsg = wx.post_message(wx.textcard_values(title, content, touser))
+    elif media_id and media_id != "1":
+        errmsg = wx.post_message(wx.mpnews_values(title, content, media_id, touser))
+    elif attach.oversized("wecom_app", title, content):
+        # text 消息超过上限时上传为文件, 另发一条简短的文字
+        errmsg = wx.send_attachment(title, content, touser)
+    else:
+        errmsg = wx.post_message(wx.text_values(title + "\n\n" + content, touser))
+    if errmsg != "ok":
+        print("推送失败！错误信息如下：\n", errmsg)
+    return errmsg == "ok"
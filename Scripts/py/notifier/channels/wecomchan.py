@@ -0,0 +1,15 @@
+def configure(env):
+    domain = env["WECOMCHAN_DOMAIN"]
+    if not domain.endswith("/"):
+        domain += "/"
+    return {"url": f"{domain}wecomchan", "key": env["WECOMCHAN_SEND_KEY"],
+            "touser": env.get("WECOMCHAN_TO_USER") or "@all"}
+
+
+def request(config, title, content):
+    params = {"sendkey": config["key"], "msg_type": "text", "to_user": config["touser"], "msg": f"{title}\n\n{content}"}
+    return {"method": "GET", "url": config["url"], "params": params}
+
+
+def check(response):
+    return response.get("errcode") == 0
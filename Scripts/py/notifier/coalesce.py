@@ -0,0 +1,164 @@
+import atexit
+import threading
+import time
+
+from . import settings
+
+# 各渠道单条消息的上限, (长度, 计量单位)
+CHANNEL_LIMITS = {
+    "bark": (2000, "bytes"),            # 内容放在 url 中
+    "sc_key": (32000, "bytes"),
+    "telegram_bot": (4096, "chars"),
+    "dingding_bot": (20000, "bytes"),
+    "coolpush_bot": (3000, "bytes"),
+    "pushplus_bot": (20000, "chars"),
+    "wecom_app": (2048, "bytes"),
+    "wecomchan": (2048, "bytes"),
+    "xuthus_coolpush": (3000, "bytes"),
+}
+DEFAULT_LIMIT = (2000, "bytes")
+# 给标题、分页标记和尾注预留的长度
+RESERVE = 200
+
+
+def text_size(text, unit):
+    if unit == "bytes":
+        return len(text.encode("utf-8"))
+    return len(text)
+
+
+def split_line(line, limit, unit):
+    """
+    单行超过上限时按字符硬切
+    """
+    parts = []
+    part = ""
+    for ch in line:
+        if part and text_size(part + ch, unit) > limit:
+            parts.append(part)
+            part = ""
+        part += ch
+    if part:
+        parts.append(part)
+    return parts
+
+
+def split_chunks(text, limit, unit="chars"):
+    """
+    按行切分 text, 每块不超过 limit
+    """
+    chunks = []
+    lines = []
+    size = 0
+    for line in text.split("\n"):
+        line_size = text_size(line, unit) + 1
+        if line_size > limit:
+            pieces = split_line(line, limit - 1, unit)
+        else:
+            pieces = [line]
+        for piece in pieces:
+            piece_size = text_size(piece, unit) + 1
+            if lines and size + piece_size > limit:
+                chunks.append("\n".join(lines))
+                lines = []
+                size = 0
+            lines.append(piece)
+            size += piece_size
+    if lines:
+        chunks.append("\n".join(lines))
+    return chunks
+
+
+def digest(entries):
+    """
+    把多条 (title, content) 合并为一条
+    """
+    if len(entries) == 1:
+        return entries[0]
+    titles = {title for title, _ in entries}
+    title = entries[0][0] if len(titles) == 1 else f"{len(entries)}条通知汇总"
+    content = "\n\n".join(f"【{t}】\n{c.strip()}" for t, c in entries)
+    return title, content
+
+
+def channel_jobs(channels, entries, unchunked=()):
+    """
+    为每个渠道生成按上限切好的 (channel, title, content)
+    unchunked 中的渠道不切分, 由渠道自行以附件发送
+    """
+    title, content = digest(entries)
+    jobs = []
+    for channel in channels:
+        if channel in unchunked:
+            jobs.append((channel, title, content))
+            continue
+        limit, unit = CHANNEL_LIMITS.get(channel, DEFAULT_LIMIT)
+        limit -= RESERVE + text_size(title, unit)
+        chunks = split_chunks(content, limit, unit)
+        for i, chunk in enumerate(chunks):
+            page = f" ({i + 1}/{len(chunks)})" if len(chunks) > 1 else ""
+            jobs.append((channel, title + page, chunk))
+    return jobs
+
+
+def channel_entries(channels, entries):
+    """
+    每个渠道只汇总推送给它的通知, entries 为 [(title, content, 渠道名列表或 None)], None 为全部渠道
+    :return: [(channel, [(title, content)])], 没有通知的渠道不出现
+    """
+    result = []
+    for channel in channels:
+        items = [(title, content) for title, content, names in entries if names is None or channel in names]
+        if items:
+            result.append((channel, items))
+    return result
+
+
+class Coalescer(object):
+    """
+    缓存 send() 的调用, 窗口到期或进程退出时每个渠道推送一份汇总
+
+    deliver(jobs) 负责实际推送, jobs 为 [(channel, title, content)]
+    channels() 返回当前启用的渠道, add() 传入 channels 时该条只汇总到这些渠道
+    delivered(results, marks) 在推送后调用, marks 为这批 add() 传入的 mark
+    """
+
+    def __init__(self, deliver, channels, window=None, unchunked=(), delivered=None):
+        self.deliver = deliver
+        self.channels = channels
+        self.unchunked = unchunked
+        self.delivered = delivered
+        self.window = settings.NOTIFY_COALESCE_WINDOW if window is None else window
+        self.entries = []
+        self.marks = []
+        self.lock = threading.Lock()
+        self.timer = None
+        atexit.register(self.flush)
+
+    def add(self, title, content, mark=None, channels=None):
+        with self.lock:
+            self.entries.append((title, content, channels))
+            if mark is not None:
+                self.marks.append(mark)
+            if self.window > 0 and self.timer is None:
+                self.timer = threading.Timer(self.window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            entries, marks = self.entries, self.marks
+            self.entries, self.marks = [], []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not entries:
+            return []
+        print(f"\n合并推送 {len(entries)} 条通知 {time.strftime('%H:%M:%S')}")
+        jobs = []
+        for channel, items in channel_entries(self.channels(), entries):
+            jobs += channel_jobs([channel], items, self.unchunked)
+        results = self.deliver(jobs)
+        if self.delivered:
+            self.delivered(results, marks)
+        return results
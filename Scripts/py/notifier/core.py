@@ -0,0 +1,427 @@
+import os
+import sys
+import threading
+import time
+
+import requests
+
+from . import channels, settings, transport
+
+# asyncio、sqlite3 以及去重、合并、附件、outbox 等模块用到时才导入, import sendNotify 时只加载 requests
+
+_default = None
+_message_buffer = None
+_coalescer = None
+_lazy_lock = threading.Lock()
+# 合并推送时附在每份汇总后的尾注, 取最近一次 send() 传入的值
+coalesce_footer = ''
+
+
+def __getattr__(name):
+    # core.message_buffer / core.coalescer 首次使用时才创建
+    if name == 'message_buffer':
+        return get_message_buffer()
+    if name == 'coalescer':
+        return get_coalescer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_message_buffer():
+    """
+    message() 的输出, 超过 NOTIFY_BUFFER_BYTES 后旧日志写入临时文件
+    """
+    global _message_buffer
+    with _lazy_lock:
+        if _message_buffer is None:
+            from . import buffer
+            _message_buffer = buffer.MessageBuffer()
+    return _message_buffer
+
+
+def message(str_msg):
+    print(str_msg)
+    get_message_buffer().append(str_msg)
+    sys.stdout.flush()
+
+
+def default_channels():
+    """
+    按 os.environ 启用的渠道, 首次推送时才加载
+    """
+    global _default
+    if _default is None:
+        _default = {channel.name: channel for channel in channels.enabled()}
+    return _default
+
+
+def resolve(env=None):
+    if env is None:
+        return default_channels()
+    return {channel.name: channel for channel in channels.enabled(env)}
+
+
+def select(enabled, only=None):
+    if only is None:
+        return enabled
+    return {name: channel for name, channel in enabled.items() if name in only}
+
+
+def channel_timeout(name):
+    """
+    渠道的推送时限, NOTIFY_TIMEOUT_渠道名 优先于 NOTIFY_TIMEOUT
+    """
+    key = "NOTIFY_TIMEOUT_" + name.upper()
+    if os.environ.get(key):
+        return float(os.environ[key])
+    return settings.NOTIFY_TIMEOUT
+
+
+def remaining(deadline):
+    """
+    距 deadline 还剩的秒数, 已超时抛出 requests 的 Timeout
+    """
+    left = deadline - time.time()
+    if left <= 0:
+        raise requests.exceptions.Timeout("超过推送时限")
+    return left
+
+
+def backoff(name, wait, deadline):
+    """
+    记录服务端的退避要求, 超出剩余时限时直接失败交给 outbox, 不在推送中长时间等待
+    """
+    from . import metrics, ratelimit
+    ratelimit.penalize(name, wait)
+    if wait > remaining(deadline):
+        raise ratelimit.RateLimitExceeded(f"{name} 服务端要求等待 {wait:.0f} 秒, 超过推送时限")
+    metrics.retried(name)
+
+
+def channel_request(name, spec, deadline=None):
+    """
+    经 ratelimit 排队后发出请求, 服务端要求退避(429 / retry_after)且时限内等得及时再试一次
+    deadline: 排队、退避和请求都须在此时刻前完成, 默认为 channel_timeout 秒后
+    :return: 响应的 json
+    """
+    from . import metrics, ratelimit
+    if deadline is None:
+        deadline = time.time() + channel_timeout(name)
+    stream = None
+    if settings.NOTIFY_ATTACH == "true":
+        # 只有附件上传会带 MultipartStream, 关闭附件时不必加载 attach
+        from . import attach
+        body = spec.get("data")
+        stream = body if isinstance(body, attach.MultipartStream) else None
+    try:
+        for i in range(2):
+            ratelimit.acquire(name, remaining(deadline))
+            if stream:
+                stream.rewind()
+            response = transport.request(**spec, timeout=min(channel_timeout(name), remaining(deadline)),
+                                         deadline=deadline)
+            if response.raw is not None and response.raw.retries is not None:
+                metrics.retried(name, len(response.raw.retries.history))
+            try:
+                data = response.json()
+            except ValueError:
+                data = None
+            wait = ratelimit.retry_after(response.status_code, response.headers, data)
+            if wait is None:
+                break
+            backoff(name, wait, deadline)
+    finally:
+        if stream:
+            stream.discard()
+    return response.json() if data is None else data
+
+
+def call_channel(channel, title, content, deadline=None):
+    backend = channel.backend
+    if hasattr(backend, "send"):
+        return backend.send(channel.config, title, content, lambda spec: channel_request(channel.name, spec, deadline))
+    return backend.check(channel_request(channel.name, backend.request(channel.config, title, content), deadline))
+
+
+class NotifyResult:
+    """
+    单个渠道的推送结果
+    status: ok / fail / timeout / error
+    """
+    def __init__(self, channel, status, elapsed=0.0, error=''):
+        self.channel = channel
+        self.status = status
+        self.elapsed = elapsed
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.status == 'ok'
+
+    def __repr__(self):
+        return f"NotifyResult({self.channel}, {self.status}, {self.elapsed:.2f}s)"
+
+
+def push_channel(channel, title, content, keep=True):
+    """
+    调用单个渠道并返回 NotifyResult, 渠道内的异常不会向外抛出
+    channel: channels.Channel 或 os.environ 中启用的渠道名
+    keep: 失败时存入 outbox, 下次运行重发
+    """
+    from . import metrics, outbox
+    if isinstance(channel, str):
+        name = channel
+        channel = default_channels().get(name)
+        if not channel:
+            print(f'{name} 未启用')
+            return NotifyResult(name, 'error', error='未启用')
+    start = time.time()
+    try:
+        ok = call_channel(channel, title, content, start + channel_timeout(channel.name))
+        print(f"{channel.label} {'推送成功！' if ok else '推送失败！'}")
+        result = NotifyResult(channel.name, 'ok' if ok else 'fail', time.time() - start)
+    except requests.exceptions.Timeout as e:
+        print(f'{channel.label} 推送超时！')
+        result = NotifyResult(channel.name, 'timeout', time.time() - start, str(e))
+    except Exception as e:
+        print(f'{channel.label} 推送失败！{e}')
+        result = NotifyResult(channel.name, 'error', time.time() - start, str(e))
+    metrics.record(result.channel, result.status, result.elapsed)
+    if keep and not result.ok:
+        outbox.add(channel.name, title, content, result.error or result.status)
+    return result
+
+
+def send_concurrent(title, content, targets, keep=True):
+    """
+    所有渠道同时推送, 每个渠道在自己的时限内完成, 总耗时取决于最慢的渠道
+    推送在守护线程中进行, 超时未返回的渠道不会拖住进程退出
+    超时的渠道立即存入 outbox, 以免进程随后退出时丢失; 请求之后又成功时再从 outbox 删除
+    :return: [NotifyResult]
+    """
+    from . import metrics, outbox
+    targets = list(targets)
+    if not targets:
+        return []
+    start = time.time()
+    lock = threading.Lock()
+    results = {}
+    queued = {}
+
+    def worker(channel):
+        result = push_channel(channel, title, content, keep=False)
+        with lock:
+            if channel.name not in queued:
+                results[channel.name] = result
+                if keep and not result.ok:
+                    outbox.add(channel.name, title, content, result.error or result.status)
+            elif result.ok:
+                outbox.remove(queued[channel.name])
+
+    threads = [(i, threading.Thread(target=worker, args=(i,), daemon=True)) for i in targets]
+    for _, thread in threads:
+        thread.start()
+    for channel, thread in threads:
+        thread.join(max(start + channel_timeout(channel.name) - time.time(), 0))
+        with lock:
+            if channel.name in results:
+                continue
+            print(f'{channel.label} 推送超时！')
+            results[channel.name] = NotifyResult(channel.name, 'timeout', time.time() - start, '超过推送时限')
+            metrics.deadline_exceeded(channel.name)
+            queued[channel.name] = outbox.add(channel.name, title, content, '超过推送时限') if keep else None
+    return [results[channel.name] for channel in targets]
+
+
+def dispatch(title, content, targets, keep=True):
+    """
+    向 targets (channels.Channel 列表) 推送, 不经过去重和合并
+    """
+    if settings.NOTIFY_CONCURRENT == 'true':
+        return send_concurrent(title, content, targets, keep)
+    return [push_channel(i, title, content, keep) for i in targets]
+
+
+def deliver(jobs):
+    """
+    推送合并后的汇总, jobs 为 [(channel, title, content)]
+    """
+    return [push_channel(channel, title, content + coalesce_footer) for channel, title, content in jobs]
+
+
+def filter_dedup(names, title, content):
+    """
+    返回 (去重后需要推送的渠道, 待推送的屏蔽汇总), 未设置 NOTIFY_DEDUP_TTL 时不加载 dedup
+    """
+    if settings.NOTIFY_DEDUP_TTL <= 0:
+        return names, ''
+    from . import dedup
+    return dedup.filter_channels(names, title, content), dedup.take_summary()
+
+
+def mark_sent(results, title, content):
+    """
+    只把推送成功的渠道记入去重
+    """
+    if settings.NOTIFY_DEDUP_TTL <= 0:
+        return
+    from . import dedup
+    dedup.mark_sent([i.channel for i in results if i.ok], title, content)
+
+
+def coalesce_sent(results, marks):
+    """
+    汇总的所有分页都推送成功的渠道, 才把其中的每条通知记入去重
+    """
+    if settings.NOTIFY_DEDUP_TTL <= 0 or not marks:
+        return
+    from . import dedup
+    failed = {i.channel for i in results if not i.ok}
+    sent = {i.channel for i in results if i.ok} - failed
+    for names, title, content in marks:
+        dedup.mark_sent([i for i in names if i in sent], title, content)
+
+
+def get_coalescer():
+    """
+    NOTIFY_COALESCE=true 时使用的合并器, 首次合并推送时创建
+    """
+    global _coalescer
+    with _lazy_lock:
+        if _coalescer is None:
+            # metrics 先于合并器注册 atexit, 退出时先推送汇总再保存指标快照
+            from . import attach, coalesce, metrics
+            _coalescer = coalesce.Coalescer(deliver, lambda: list(default_channels()),
+                                            unchunked=attach.SUPPORTED if attach.enabled() else (),
+                                            delivered=coalesce_sent)
+    return _coalescer
+
+
+def send(title, content, env=None, footer='', options=None, only=None):
+    """
+    向所有启用的渠道推送
+    env: 读取渠道配置的 mapping, 默认 os.environ; 自带配置的脚本传入自己的值, 此时不合并、失败不进 outbox
+    footer: 附在内容后的尾注, 不参与去重
+    options: {渠道名: {配置项: 值}}, 覆盖本次推送的渠道配置, 如 {'wecom_app': {'touser': 'a|b'}}
+    only: 只推送到这些渠道名, 默认全部
+    NOTIFY_CONCURRENT=true 时各渠道并发推送
+    NOTIFY_COALESCE=true 时先缓存, 由 coalescer 统一推送
+    设置 NOTIFY_DEDUP_TTL 后, 该时间内已推送成功的重复通知不再推送, 每 NOTIFY_DEDUP_SUMMARY 秒汇总一次被屏蔽的数量
+    :return: [NotifyResult]
+    """
+    global coalesce_footer
+    enabled = select(resolve(env), only)
+    names, summary = filter_dedup(list(enabled), title, content)
+    if settings.NOTIFY_COALESCE == 'true' and env is None and not options and only is None:
+        coalesce_footer = footer
+        if names:
+            get_coalescer().add(title, content, (names, title, content), names)
+        if summary:
+            from . import dedup
+            get_coalescer().add(dedup.SUMMARY_TITLE, summary)
+        return []
+    targets = [enabled[i].with_config(**options[i]) if options and i in options else enabled[i] for i in names]
+    keep = env is None
+    results = dispatch(title, content + footer, targets, keep)
+    mark_sent(results, title, content)
+    if summary:
+        from . import dedup
+        results += dispatch(dedup.SUMMARY_TITLE, summary + footer, enabled.values(), keep)
+    return results
+
+
+async def channel_request_async(name, spec, deadline=None):
+    """
+    channel_request 的异步版本, 排队等待在线程池中进行
+    """
+    import asyncio
+    from . import aio, ratelimit
+    if deadline is None:
+        deadline = time.time() + channel_timeout(name)
+    loop = asyncio.get_running_loop()
+    for i in range(2):
+        await loop.run_in_executor(None, ratelimit.acquire, name, remaining(deadline))
+        status, headers, data = await aio.fetch(**spec, timeout=min(channel_timeout(name), remaining(deadline)))
+        wait = ratelimit.retry_after(status, headers, data)
+        if wait is None:
+            break
+        await loop.run_in_executor(None, backoff, name, wait, deadline)
+    if data is None:
+        raise ValueError(f"{name} 返回的不是 json, 状态码 {status}")
+    return data
+
+
+async def push_channel_async(channel, title, content, keep=True):
+    """
+    push_channel 的异步版本, 不阻塞事件循环
+    """
+    import asyncio
+    from . import metrics, outbox
+    loop = asyncio.get_running_loop()
+    backend = channel.backend
+    oversized = False
+    if settings.NOTIFY_ATTACH == "true":
+        from . import attach
+        oversized = attach.oversized(channel.name, title, content)
+    if hasattr(backend, "send") or oversized:
+        # 自带流程的渠道(企业微信)和附件上传交给线程池中的同步实现
+        return await loop.run_in_executor(None, push_channel, channel, title, content, keep)
+    start = time.time()
+    try:
+        response = await channel_request_async(channel.name, backend.request(channel.config, title, content),
+                                               start + channel_timeout(channel.name))
+        ok = backend.check(response)
+        print(f"{channel.label} {'推送成功！' if ok else '推送失败！'}")
+        result = NotifyResult(channel.name, 'ok' if ok else 'fail', time.time() - start)
+    except (asyncio.TimeoutError, requests.exceptions.Timeout) as e:
+        # remaining() 超过时限时抛出的是 requests 的 Timeout, 与同步版本一样记为 timeout
+        print(f'{channel.label} 推送超时！')
+        result = NotifyResult(channel.name, 'timeout', time.time() - start, str(e))
+    except Exception as e:
+        print(f'{channel.label} 推送失败！{e}')
+        result = NotifyResult(channel.name, 'error', time.time() - start, str(e))
+    metrics.record(result.channel, result.status, result.elapsed)
+    if keep and not result.ok:
+        await loop.run_in_executor(None, outbox.add, channel.name, title, content, result.error or result.status)
+    return result
+
+
+async def send_async(title, content, env=None, footer='', options=None, only=None):
+    """
+    send 的异步版本, 供 telethon 等运行在事件循环中的脚本使用, 各渠道并发推送
+    事件循环结束前可 await notifier.aio.close() 关闭连接
+    :return: [NotifyResult]
+    """
+    import asyncio
+    global coalesce_footer
+    loop = asyncio.get_running_loop()
+    enabled = select(await loop.run_in_executor(None, resolve, env), only)
+    names, summary = await loop.run_in_executor(None, filter_dedup, list(enabled), title, content)
+    if settings.NOTIFY_COALESCE == 'true' and env is None and not options and only is None:
+        coalesce_footer = footer
+        if names:
+            get_coalescer().add(title, content, (names, title, content), names)
+        if summary:
+            from . import dedup
+            get_coalescer().add(dedup.SUMMARY_TITLE, summary)
+        return []
+    keep = env is None
+    targets = [enabled[i].with_config(**options[i]) if options and i in options else enabled[i] for i in names]
+    results = list(await asyncio.gather(*[push_channel_async(i, title, content + footer, keep) for i in targets]))
+    await loop.run_in_executor(None, mark_sent, results, title, content)
+    if summary:
+        from . import dedup
+        jobs = [push_channel_async(i, dedup.SUMMARY_TITLE, summary + footer, keep) for i in enabled.values()]
+        results += await asyncio.gather(*jobs)
+    return results
+
+
+def replay_outbox():
+    """
+    在后台重发上次运行失败的推送, 只处理 os.environ 中启用的渠道
+    """
+    names = channels.configured()
+    if not names:
+        return None
+    from . import outbox
+    return outbox.replay_in_background(lambda name, title, content: push_channel(name, title, content, keep=False),
+                                       names)
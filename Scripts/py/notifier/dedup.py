@@ -0,0 +1,139 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+
+from . import settings
+
+SUMMARY_TITLE = "重复通知汇总"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    digest TEXT PRIMARY KEY,
+    channel TEXT NOT NULL,
+    title TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    suppressed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+# 时间戳不参与比较, 只有时间不同的通知视为重复
+TIME_PATTERN = re.compile(r"\d{4}[-/]\d{1,2}[-/]\d{1,2}([ T]\d{1,2}:\d{2}(:\d{2})?)?|\d{1,2}:\d{2}:\d{2}")
+SPACE_PATTERN = re.compile(r"\s+")
+
+
+def enabled():
+    return settings.NOTIFY_DEDUP_TTL > 0
+
+
+def db_path():
+    return os.path.join(settings.NOTIFY_CACHE_DIR, "notify_dedup.db")
+
+
+def connect():
+    conn = sqlite3.connect(db_path(), timeout=10)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def normalize(content):
+    content = TIME_PATTERN.sub("<time>", content)
+    return SPACE_PATTERN.sub(" ", content).strip()
+
+
+def digest(channel, title, content):
+    text = f"{channel}\n{title.strip()}\n{normalize(content)}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def should_send(channel, title, content, conn=None):
+    """
+    TTL 内已推送成功过相同内容时记一次屏蔽并返回 False, 推送成功后由 mark_sent 记录
+    """
+    if not enabled():
+        return True
+    if conn is None:
+        with closing(connect()) as conn:
+            return should_send(channel, title, content, conn)
+    key = digest(channel, title, content)
+    row = conn.execute("SELECT sent_at FROM seen WHERE digest = ?", (key,)).fetchone()
+    if row and time.time() - row[0] < settings.NOTIFY_DEDUP_TTL:
+        conn.execute("UPDATE seen SET suppressed = suppressed + 1 WHERE digest = ?", (key,))
+        conn.commit()
+        return False
+    return True
+
+
+def mark_sent(channels, title, content):
+    """
+    记录 channels 已成功推送该通知, 失败的推送不记录, 重试时不会被屏蔽
+    """
+    if not enabled() or not channels:
+        return
+    now = time.time()
+    try:
+        with closing(connect()) as conn:
+            conn.executemany("INSERT INTO seen (digest, channel, title, sent_at) VALUES (?, ?, ?, ?) "
+                             "ON CONFLICT(digest) DO UPDATE SET sent_at = excluded.sent_at",
+                             [(digest(i, title, content), i, title, now) for i in channels])
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"记录已推送通知失败: {e}")
+
+
+def filter_channels(channels, title, content):
+    """
+    返回需要推送的渠道
+    """
+    if not enabled() or not channels:
+        return list(channels)
+    try:
+        with closing(connect()) as conn:
+            result = [i for i in channels if should_send(i, title, content, conn)]
+    except sqlite3.Error as e:
+        print(f"通知去重失败, 照常推送: {e}")
+        return list(channels)
+    if len(result) < len(channels):
+        print(f"{title} 与近期通知重复, 已屏蔽 {len(channels) - len(result)} 个渠道")
+    return result
+
+
+def take_summary():
+    """
+    距上次汇总超过 NOTIFY_DEDUP_SUMMARY 秒且有被屏蔽的通知时, 返回汇总内容并清零计数
+    """
+    if not enabled() or not os.path.exists(db_path()):
+        return ""
+    now = time.time()
+    try:
+        with closing(connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'summary_at'").fetchone()
+            if row is None:
+                conn.execute("INSERT INTO meta (key, value) VALUES ('summary_at', ?)", (now,))
+                conn.commit()
+                return ""
+            if now - row[0] < settings.NOTIFY_DEDUP_SUMMARY:
+                return ""
+            # 同一通知在各渠道的屏蔽次数相同, 按标题取最大值
+            rows = conn.execute("SELECT title, MAX(suppressed) FROM (SELECT title, channel, SUM(suppressed) AS suppressed "
+                                "FROM seen GROUP BY title, channel) GROUP BY title HAVING MAX(suppressed) > 0").fetchall()
+            conn.execute("UPDATE seen SET suppressed = 0")
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'summary_at'", (now,))
+            expire = now - max(settings.NOTIFY_DEDUP_TTL, settings.NOTIFY_DEDUP_SUMMARY) * 2
+            conn.execute("DELETE FROM seen WHERE sent_at < ?", (expire,))
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"读取重复通知汇总失败: {e}")
+        return ""
+    if not rows:
+        return ""
+    total = sum(count for _, count in rows)
+    lines = [f"过去 {(now - row[0]) / 3600:.0f} 小时共屏蔽 {total} 条重复通知:"]
+    lines += [f"{title} × {count}" for title, count in rows]
+    return "\n".join(lines)
@@ -0,0 +1,254 @@
+"""
+本地模拟各推送平台接口, 用于压测和离线验证, 不会真正发出通知
+
+配合 NOTIFY_API_BASE 使用: transport 把请求改发到这里, 原 host 放在 X-Notify-Host 头中,
+按 host 返回对应平台格式的响应. 每个请求按比例随机得到以下结果之一:
+ok 成功 / errcode 业务错误 / ratelimit 限流(429 或 retry_after) / slow 延迟后成功 / reset 直接断开连接
+
+python -m notifier.fakeserver --port 8000 --errcode 0.1 --ratelimit 0.05
+"""
+import argparse
+import http.server
+import json
+import random
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+
+OUTCOMES = ("ok", "errcode", "ratelimit", "slow", "reset")
+
+# host: 平台
+SERVICES = {
+    "api.day.app": "bark",
+    "sc.ftqq.com": "serverchan",
+    "sctapi.ftqq.com": "serverchan",
+    "api.telegram.org": "telegram",
+    "oapi.dingtalk.com": "dingtalk",
+    "qmsg.zendee.cn": "qmsg",
+    "www.pushplus.plus": "pushplus",
+    "qyapi.weixin.qq.com": "wecom",
+    "push.xuthus.cc": "coolpush",
+}
+
+
+def service_of(host, path):
+    service = SERVICES.get(host)
+    if service:
+        return service
+    # 自建 bark / TG_API_HOST 等直接指向本服务时按路径判断
+    if path.startswith("/bot"):
+        return "telegram"
+    if path.startswith("/cgi-bin/"):
+        return "wecom"
+    if path.startswith("/robot/"):
+        return "dingtalk"
+    if path.endswith("/wecomchan"):
+        return "wecomchan"
+    return "bark"
+
+
+def respond(service, path, outcome, retry_after):
+    """
+    返回 (状态码, 响应头, json), 格式与各平台文档一致
+    """
+    headers = {}
+    if service == "telegram":
+        if outcome == "ratelimit":
+            return 429, {"Retry-After": str(retry_after)}, {
+                "ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {retry_after}",
+                "parameters": {"retry_after": retry_after}}
+        if outcome == "errcode":
+            return 400, headers, {"ok": False, "error_code": 400, "description": "Bad Request: chat not found"}
+        return 200, headers, {"ok": True, "result": {"message_id": 1}}
+    if service == "dingtalk":
+        if outcome == "ratelimit":
+            return 200, headers, {"errcode": 130101, "errmsg": "send too fast"}
+        if outcome == "errcode":
+            return 200, headers, {"errcode": 310000, "errmsg": "sign not match"}
+        return 200, headers, {"errcode": 0, "errmsg": "ok"}
+    if service == "wecom":
+        if path.startswith("/cgi-bin/gettoken"):
+            return 200, headers, {"errcode": 0, "errmsg": "ok", "access_token": "fake-token", "expires_in": 7200}
+        if outcome == "ratelimit":
+            return 200, headers, {"errcode": 45009, "errmsg": "reach max api daily quota limit"}
+        if outcome == "errcode":
+            return 200, headers, {"errcode": 40001, "errmsg": "invalid credential"}
+        if path.startswith("/cgi-bin/media/upload"):
+            return 200, headers, {"errcode": 0, "errmsg": "ok", "type": "file", "media_id": "fake-media"}
+        return 200, headers, {"errcode": 0, "errmsg": "ok"}
+    if service == "wecomchan":
+        if outcome == "errcode":
+            return 200, headers, {"errcode": 40001, "errmsg": "invalid credential"}
+        if outcome == "ok" or outcome == "slow":
+            return 200, headers, {"errcode": 0, "errmsg": "ok"}
+    if outcome == "ratelimit":
+        return 429, {"Retry-After": str(retry_after)}, {"code": 429, "message": "too many requests"}
+    if service == "serverchan":
+        if outcome == "errcode":
+            return 200, headers, {"code": 40001, "errno": 40001, "message": "bad pushtoken"}
+        return 200, headers, {"code": 0, "errno": 0, "message": "", "data": {"pushid": "1"}}
+    if service == "qmsg":
+        if outcome == "errcode":
+            return 200, headers, {"success": False, "reason": "key 错误", "code": 500}
+        return 200, headers, {"success": True, "reason": "操作成功", "code": 0}
+    if service in ("pushplus", "coolpush"):
+        if outcome == "errcode":
+            return 200, headers, {"code": 999, "msg": "token 错误"}
+        return 200, headers, {"code": 200, "msg": "请求成功"}
+    if outcome == "errcode":
+        return 400, headers, {"code": 400, "message": "failed"}
+    return 200, headers, {"code": 200, "message": "success"}
+
+
+class Stats(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.connections = 0
+        self.requests = 0
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.services = {}
+
+    def connected(self):
+        with self.lock:
+            self.connections += 1
+
+    def record(self, service, outcome):
+        with self.lock:
+            self.requests += 1
+            self.outcomes[outcome] += 1
+            self.services[service] = self.services.get(service, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return {"connections": self.connections, "requests": self.requests,
+                    "outcomes": dict(self.outcomes), "services": dict(self.services)}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头和正文分两次写出, 不关闭 Nagle 时每个请求会多等一个延迟 ACK
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.reset_connection = False
+        self.server.stats.connected()
+
+    def handle_request(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        host = self.headers.get("X-Notify-Host") or self.headers.get("Host", "")
+        path = urllib.parse.urlsplit(self.path).path
+        service = service_of(host, path)
+        outcome = self.server.pick()
+        self.server.stats.record(service, outcome)
+        if outcome == "reset":
+            self.reset_connection = True
+            self.close_connection = True
+            return
+        if outcome == "slow":
+            time.sleep(self.server.slow_seconds)
+        status, headers, body = respond(service, path, outcome, self.server.retry_after)
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = handle_request
+    do_POST = handle_request
+
+    def finish(self):
+        if self.reset_connection:
+            # SO_LINGER 为 0 时 close 发送 RST, 客户端得到 connection reset
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            self.connection.close()
+            return
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeServer(http.server.ThreadingHTTPServer):
+    """
+    weights: {结果: 比例}, 未列出的比例归入 ok
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, weights=None, slow_seconds=1.0, retry_after=1, seed=None):
+        super().__init__((host, port), Handler)
+        weights = dict(weights or {})
+        weights["ok"] = max(1.0 - sum(v for k, v in weights.items() if k != "ok"), 0.0)
+        self.weights = [weights.get(i, 0.0) for i in OUTCOMES]
+        self.slow_seconds = slow_seconds
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.stats = Stats()
+        self.thread = None
+
+    @property
+    def url(self):
+        return "http://{}:{}".format(*self.server_address[:2])
+
+    def pick(self):
+        with self.random_lock:
+            return self.random.choices(OUTCOMES, self.weights)[0]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="notify-fakeserver", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def add_arguments(parser):
+    parser.add_argument("--errcode", type=float, default=0.0, help="返回业务错误的比例")
+    parser.add_argument("--ratelimit", type=float, default=0.0, help="返回限流的比例")
+    parser.add_argument("--slow", type=float, default=0.0, help="延迟响应的比例")
+    parser.add_argument("--reset", type=float, default=0.0, help="断开连接的比例")
+    parser.add_argument("--slow-seconds", type=float, default=1.0, help="延迟响应的秒数")
+    parser.add_argument("--retry-after", type=int, default=1, help="限流响应要求等待的秒数")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def from_arguments(args, host="127.0.0.1", port=0):
+    weights = {"errcode": args.errcode, "ratelimit": args.ratelimit, "slow": args.slow, "reset": args.reset}
+    return FakeServer(host, port, weights, args.slow_seconds, args.retry_after, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟推送平台接口")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = from_arguments(args, args.host, args.port)
+    print(f"模拟推送接口已启动 {server.url}, 设置 NOTIFY_API_BASE={server.url} 后运行脚本")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats.snapshot(), ensure_ascii=False))
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
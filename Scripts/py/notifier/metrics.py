@@ -0,0 +1,166 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+from . import ratelimit, settings
+
+# 推送耗时直方图的分桶(秒)
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+STATUSES = ("ok", "fail", "timeout", "error")
+
+_lock = threading.Lock()
+# 本次运行的增量, 退出时合并进累计值
+_pending = {}
+
+
+def enabled():
+    return settings.NOTIFY_METRICS.lower() not in ("", "false", "0")
+
+
+def state_path():
+    return os.path.join(settings.NOTIFY_METRICS_DIR, "notify_metrics.json")
+
+
+def prom_path():
+    return os.path.join(settings.NOTIFY_METRICS_DIR, "notify_metrics.prom")
+
+
+def new_channel():
+    return {"status": dict.fromkeys(STATUSES, 0), "buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0,
+            "retries": 0, "deadline": 0, "last": 0}
+
+
+def _channel(name):
+    item = _pending.get(name)
+    if item is None:
+        item = _pending[name] = new_channel()
+    return item
+
+
+def record(channel, status, elapsed):
+    """
+    记录一次推送的结果和耗时
+    """
+    if not enabled():
+        return
+    with _lock:
+        item = _channel(channel)
+        item["status"][status] = item["status"].get(status, 0) + 1
+        index = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                index = i
+                break
+        item["buckets"][index] += 1
+        item["sum"] += elapsed
+        item["count"] += 1
+        item["last"] = time.time()
+
+
+def retried(channel, count=1):
+    """
+    记录重试次数, 包括 urllib3 的连接重试和限流后的重发
+    """
+    if not enabled() or count <= 0:
+        return
+    with _lock:
+        _channel(channel)["retries"] += count
+
+
+def deadline_exceeded(channel):
+    """
+    并发推送时超过 NOTIFY_TIMEOUT 被放弃等待的次数
+    """
+    if not enabled():
+        return
+    with _lock:
+        _channel(channel)["deadline"] += 1
+
+
+def merge(total, delta):
+    for name, item in delta.items():
+        base = total.setdefault(name, new_channel())
+        for status, count in item["status"].items():
+            base["status"][status] = base["status"].get(status, 0) + count
+        base["buckets"] = [a + b for a, b in zip(base["buckets"], item["buckets"])]
+        for key in ("sum", "count", "retries", "deadline"):
+            base[key] += item[key]
+        base["last"] = max(base["last"], item["last"])
+    return total
+
+
+def labels(**kwargs):
+    return ",".join(f'{key}="{value}"' for key, value in kwargs.items())
+
+
+def render_prom(state):
+    """
+    Prometheus textfile 格式, 供 node_exporter 的 textfile collector 读取
+    """
+    lines = [
+        "# HELP notify_push_total Notification pushes by channel and result.",
+        "# TYPE notify_push_total counter",
+    ]
+    for name, item in sorted(state.items()):
+        for status, count in sorted(item["status"].items()):
+            lines.append(f"notify_push_total{{{labels(channel=name, status=status)}}} {count}")
+    lines += [
+        "# HELP notify_push_duration_seconds Time spent pushing one notification.",
+        "# TYPE notify_push_duration_seconds histogram",
+    ]
+    for name, item in sorted(state.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), item["buckets"]):
+            cumulative += count
+            lines.append(f"notify_push_duration_seconds_bucket{{{labels(channel=name, le=bound)}}} {cumulative}")
+        lines.append(f"notify_push_duration_seconds_sum{{{labels(channel=name)}}} {item['sum']:.6f}")
+        lines.append(f"notify_push_duration_seconds_count{{{labels(channel=name)}}} {item['count']}")
+    for metric, key, help_text in (
+            ("notify_retries_total", "retries", "Requests retried after a connection error or rate limit."),
+            ("notify_deadline_exceeded_total", "deadline", "Concurrent pushes abandoned after NOTIFY_TIMEOUT."),
+            ("notify_last_push_timestamp_seconds", "last", "Unix time of the last push attempt.")):
+        kind = "gauge" if key == "last" else "counter"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for name, item in sorted(state.items()):
+            lines.append(f"{metric}{{{labels(channel=name)}}} {item[key]:.0f}")
+    return "\n".join(lines) + "\n"
+
+
+def write_atomic(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def flush():
+    """
+    把本次运行的增量合并进累计值并写出, 多个脚本同时退出时由文件锁串行化
+    """
+    global _pending
+    with _lock:
+        delta, _pending = _pending, {}
+    if not delta or not enabled():
+        return None
+    try:
+        os.makedirs(settings.NOTIFY_METRICS_DIR, exist_ok=True)
+        with ratelimit.FileLock(state_path() + ".lock"):
+            try:
+                with open(state_path(), "r", encoding="utf-8") as f:
+                    state = json.load(f).get("channels", {})
+            except (OSError, ValueError):
+                state = {}
+            state = merge(state, delta)
+            write_atomic(state_path(), json.dumps({"updated": time.time(), "channels": state},
+                                                  ensure_ascii=False, indent=1))
+            if settings.NOTIFY_METRICS.lower() == "prom":
+                write_atomic(prom_path(), render_prom(state))
+        return state
+    except OSError as e:
+        print(f"写入推送指标失败: {e}")
+        return None
+
+
+atexit.register(flush)
@@ -0,0 +1,133 @@
+import os
+import sqlite3
+from contextlib import closing
+import threading
+import time
+
+from . import settings
+
+# 重发时占用一条消息的时长, 期间其他进程不会重复发送
+LEASE = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    next_at REAL NOT NULL,
+    last_error TEXT NOT NULL DEFAULT ''
+)
+"""
+
+
+def enabled():
+    return settings.NOTIFY_OUTBOX == "true"
+
+
+def db_path():
+    return os.path.join(settings.NOTIFY_CACHE_DIR, "notify_outbox.db")
+
+
+def connect():
+    conn = sqlite3.connect(db_path(), timeout=10)
+    conn.execute(SCHEMA)
+    return conn
+
+
+def backoff(attempts):
+    return min(settings.NOTIFY_OUTBOX_BACKOFF * 2 ** attempts, settings.NOTIFY_OUTBOX_BACKOFF_MAX)
+
+
+def add(channel, title, content, error=""):
+    """
+    保存推送失败的消息, 返回记录的 id, 未启用或写入失败时返回 None
+    """
+    if not enabled():
+        return None
+    now = time.time()
+    try:
+        with closing(connect()) as conn:
+            cursor = conn.execute("INSERT INTO outbox (channel, title, content, attempts, created_at, next_at, "
+                                  "last_error) VALUES (?, ?, ?, 0, ?, ?, ?)",
+                                  (channel, title, content, now, now + backoff(0), error))
+            conn.commit()
+        print(f"{channel} 推送失败, 已存入 outbox 稍后重发")
+        return cursor.lastrowid
+    except sqlite3.Error as e:
+        print(f"outbox 写入失败: {e}")
+        return None
+
+
+def remove(row_id):
+    """
+    删除 add() 保存的消息, 用于超时后又推送成功的情况
+    """
+    if row_id is None:
+        return
+    try:
+        with closing(connect()) as conn:
+            conn.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"outbox 删除失败: {e}")
+
+
+def claim(conn, row_id, now):
+    cursor = conn.execute("UPDATE outbox SET next_at = ? WHERE id = ? AND next_at <= ?", (now + LEASE, row_id, now))
+    conn.commit()
+    return cursor.rowcount == 1
+
+
+def replay(push, channels):
+    """
+    重发到期的消息, push(channel, title, content) 返回 NotifyResult
+    只处理 channels 中当前启用的渠道, 过期(NOTIFY_OUTBOX_TTL)的消息直接丢弃
+    """
+    if not enabled() or not os.path.exists(db_path()):
+        return 0
+    sent = 0
+    now = time.time()
+    with closing(connect()) as conn:
+        expired = conn.execute("DELETE FROM outbox WHERE created_at < ?", (now - settings.NOTIFY_OUTBOX_TTL,))
+        if expired.rowcount:
+            print(f"outbox 丢弃 {expired.rowcount} 条过期消息")
+        conn.commit()
+        marks = ",".join("?" * len(channels))
+        rows = conn.execute(f"SELECT id, channel, title, content, attempts FROM outbox "
+                            f"WHERE next_at <= ? AND channel IN ({marks}) ORDER BY id LIMIT ?",
+                            (now, *channels, settings.NOTIFY_OUTBOX_BATCH)).fetchall()
+        for row_id, channel, title, content, attempts in rows:
+            if not claim(conn, row_id, now):
+                continue
+            result = push(channel, title, content)
+            if result.ok:
+                conn.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+                sent += 1
+            else:
+                conn.execute("UPDATE outbox SET attempts = ?, next_at = ?, last_error = ? WHERE id = ?",
+                             (attempts + 1, time.time() + backoff(attempts + 1), result.error or result.status, row_id))
+            conn.commit()
+    if sent:
+        print(f"outbox 重发成功 {sent} 条")
+    return sent
+
+
+def replay_in_background(push, channels):
+    """
+    在后台线程中重发, 不阻塞当前脚本; 进程退出时未完成的消息留待下次
+    """
+    if not enabled() or not channels or not os.path.exists(db_path()):
+        return None
+
+    def run():
+        try:
+            replay(push, channels)
+        except Exception as e:
+            print(f"outbox 重发出错: {e}")
+
+    thread = threading.Thread(target=run, name="notify-outbox", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # 非 Linux 环境只在进程内限流
+    fcntl = None
+
+from . import settings
+
+# (次数, 秒数), 默认按各平台公开的限制取保守值
+DEFAULT_LIMITS = {
+    "bark": (60, 60),
+    "sc_key": (5, 60),
+    "telegram_bot": (20, 60),
+    "dingding_bot": (20, 60),
+    "coolpush_bot": (10, 60),
+    "pushplus_bot": (10, 60),
+    "wecom_app": (30, 60),
+    "wecomchan": (30, 60),
+    "xuthus_coolpush": (10, 60),
+}
+# 钉钉发送过快
+DINGTALK_TOO_FAST = 130101
+# 服务端未给出 retry_after 时的等待时间
+DEFAULT_RETRY_AFTER = 30
+
+_lock = threading.Lock()
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+def limits():
+    result = dict(DEFAULT_LIMITS)
+    for item in settings.NOTIFY_RATE_LIMITS.split(","):
+        if "=" not in item:
+            continue
+        channel, rate = item.split("=", 1)
+        count, seconds = rate.split("/")
+        result[channel.strip()] = (int(count), float(seconds))
+    return result
+
+
+def state_file():
+    return os.path.join(settings.NOTIFY_CACHE_DIR, "notify_ratelimit.json")
+
+
+class FileLock(object):
+    """
+    跨进程互斥, 青龙同时运行的脚本共享同一组令牌桶
+    path 为锁文件, 默认与令牌桶状态文件同名
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def __enter__(self):
+        _lock.acquire()
+        self.f = None
+        if fcntl:
+            self.f = open(self.path or state_file() + ".lock", "a")
+            fcntl.flock(self.f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        if self.f:
+            fcntl.flock(self.f, fcntl.LOCK_UN)
+            self.f.close()
+        _lock.release()
+
+
+def load_state():
+    try:
+        with open(state_file(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    path = state_file()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def take(channel, now):
+    """
+    尝试取一个令牌, 返回需要等待的秒数, 0 表示已取得
+    """
+    count, seconds = limits().get(channel, (0, 0))
+    if not count:
+        return 0
+    with FileLock():
+        state = load_state()
+        bucket = state.get(channel) or {"tokens": count, "updated": now, "blocked_until": 0}
+        if bucket["blocked_until"] > now:
+            return bucket["blocked_until"] - now
+        bucket["tokens"] = min(count, bucket["tokens"] + (now - bucket["updated"]) * count / seconds)
+        bucket["updated"] = now
+        if bucket["tokens"] >= 1:
+            bucket["tokens"] -= 1
+            wait = 0
+        else:
+            wait = (1 - bucket["tokens"]) * seconds / count
+        state[channel] = bucket
+        save_state(state)
+        return wait
+
+
+def acquire(channel, max_wait=None):
+    """
+    阻塞直到 channel 有可用令牌, 排队而不是失败
+    max_wait: 本次最多等待的秒数, 通常是渠道剩余的推送时限, 不超过 NOTIFY_RATE_MAX_WAIT
+    需要等待更久时抛出 RateLimitExceeded, 由 outbox 稍后重发
+    """
+    if max_wait is None or max_wait > settings.NOTIFY_RATE_MAX_WAIT:
+        max_wait = settings.NOTIFY_RATE_MAX_WAIT
+    start = time.time()
+    while True:
+        now = time.time()
+        wait = take(channel, now)
+        if not wait:
+            return now - start
+        if now - start + wait > max_wait:
+            raise RateLimitExceeded(f"{channel} 限流需等待 {wait:.1f} 秒, 超过 {max_wait:.1f} 秒")
+        print(f"{channel} 触发限流, 等待 {wait:.1f} 秒")
+        time.sleep(wait)
+
+
+def penalize(channel, retry_after):
+    """
+    服务端要求退避时, 清空令牌并在 retry_after 秒内暂停该渠道
+    """
+    now = time.time()
+    count, _ = limits().get(channel, (1, 1))
+    with FileLock():
+        state = load_state()
+        bucket = state.get(channel) or {"tokens": count, "updated": now, "blocked_until": 0}
+        bucket["tokens"] = 0
+        bucket["updated"] = now
+        bucket["blocked_until"] = max(bucket["blocked_until"], now + retry_after)
+        state[channel] = bucket
+        save_state(state)
+    print(f"{channel} 服务端限流, {retry_after} 秒后重试")
+
+
+def retry_after(status, headers, data):
+    """
+    从响应中识别服务端的退避要求, 返回秒数, 无需退避时返回 None
+    """
+    if isinstance(data, dict):
+        parameters = data.get("parameters") or {}
+        if "retry_after" in parameters:
+            return float(parameters["retry_after"])
+        if data.get("error_code") == 429:
+            return DEFAULT_RETRY_AFTER
+        if data.get("errcode") == DINGTALK_TOO_FAST:
+            return 60
+    if status == 429:
+        try:
+            return float(headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return DEFAULT_RETRY_AFTER
+    return None
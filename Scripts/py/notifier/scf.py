@@ -0,0 +1,65 @@
+"""
+打包腾讯云函数(SCF)的部署文件, 把 notifier 一起放进压缩包
+
+云函数只上传函数自己的目录, 不包含上级目录的 notifier, 用本工具打包后上传 zip 即可
+python -m notifier.scf HeyTap-scf -o heytap.zip          目录型函数, 入口 index.py
+python -m notifier.scf EUserv_extend.py -o euserv.zip    单文件函数, 入口为 文件名.main_handler
+"""
+import argparse
+import os
+import zipfile
+
+PACKAGE = os.path.dirname(os.path.abspath(__file__))
+# 压测和模拟接口用不到, 不打包
+EXCLUDE = {"bench.py", "fakeserver.py", "scf.py"}
+
+
+def walk(root):
+    """
+    root 下需要打包的文件, 返回 (绝对路径, 包内路径)
+    """
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = sorted(i for i in dirs if i != "__pycache__")
+        for name in sorted(files):
+            if name.endswith((".pyc", ".pyo")):
+                continue
+            path = os.path.join(folder, name)
+            yield path, os.path.relpath(path, root)
+
+
+def build(source, output):
+    """
+    source 为函数目录或单个脚本, 返回写入的文件数
+    """
+    count = 0
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zf:
+        if os.path.isdir(source):
+            files = walk(source)
+        else:
+            files = [(source, os.path.basename(source))]
+        for path, arcname in files:
+            if os.path.abspath(path) == os.path.abspath(output):
+                continue
+            zf.write(path, arcname)
+            count += 1
+        for path, arcname in walk(PACKAGE):
+            if arcname in EXCLUDE:
+                continue
+            zf.write(path, os.path.join("notifier", arcname))
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="打包云函数, 附带 notifier")
+    parser.add_argument("source", help="函数目录或单个脚本")
+    parser.add_argument("-o", "--output", default=None, help="输出的 zip, 默认为 函数名.zip")
+    args = parser.parse_args()
+    source = args.source.rstrip("/\\")
+    output = args.output or os.path.splitext(os.path.basename(source))[0] + ".zip"
+    count = build(source, output)
+    print(f"已写入 {output}, 共 {count} 个文件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+# http 连接
+NOTIFY_CONNECT_TIMEOUT = float(os.getenv("NOTIFY_CONNECT_TIMEOUT", 5))
+NOTIFY_READ_TIMEOUT = float(os.getenv("NOTIFY_READ_TIMEOUT", 15))
+NOTIFY_POOL_SIZE = int(os.getenv("NOTIFY_POOL_SIZE", 4))
+
+# 重试, POST 不幂等, 只在连接失败时重试, 读超时和状态码重试仅用于 GET 等幂等请求; 429 交给 ratelimit 处理
+NOTIFY_RETRY = int(os.getenv("NOTIFY_RETRY", 2))
+NOTIFY_RETRY_READ = int(os.getenv("NOTIFY_RETRY_READ", 0))
+NOTIFY_RETRY_BACKOFF = float(os.getenv("NOTIFY_RETRY_BACKOFF", 0.5))
+NOTIFY_RETRY_STATUS = [int(i) for i in os.getenv("NOTIFY_RETRY_STATUS", "500,502,503,504").split(",") if i]
+
+# 缓存目录, 青龙面板下默认 /ql/config, 跨次运行保留
+NOTIFY_CACHE_DIR = os.getenv("NOTIFY_CACHE_DIR", "/ql/config" if os.path.isdir("/ql/config") else tempfile.gettempdir())
+
+# 企业微信 access_token 提前刷新的秒数
+QYWX_TOKEN_MARGIN = int(os.getenv("QYWX_TOKEN_MARGIN", 300))
+
+# 合并推送, 窗口为 0 时合并整个进程的推送并在退出时发送
+NOTIFY_COALESCE_WINDOW = float(os.getenv("NOTIFY_COALESCE_WINDOW", 0))
+
+# message() 缓冲, 超出内存上限的旧日志写入临时文件, 推送时只保留首尾
+NOTIFY_BUFFER_BYTES = int(os.getenv("NOTIFY_BUFFER_BYTES", 64 * 1024))
+NOTIFY_BUFFER_HEAD = int(os.getenv("NOTIFY_BUFFER_HEAD", 20))
+NOTIFY_BUFFER_TAIL = int(os.getenv("NOTIFY_BUFFER_TAIL", 50))
+
+# 推送失败的消息存入本地 outbox, 下次运行时按指数退避重发
+NOTIFY_OUTBOX = os.getenv("NOTIFY_OUTBOX", "true")
+NOTIFY_OUTBOX_TTL = int(os.getenv("NOTIFY_OUTBOX_TTL", 24 * 3600))
+NOTIFY_OUTBOX_BACKOFF = int(os.getenv("NOTIFY_OUTBOX_BACKOFF", 60))
+NOTIFY_OUTBOX_BACKOFF_MAX = int(os.getenv("NOTIFY_OUTBOX_BACKOFF_MAX", 3600))
+NOTIFY_OUTBOX_BATCH = int(os.getenv("NOTIFY_OUTBOX_BATCH", 20))
+
+# 各渠道限流, 格式 渠道=次数/秒数, 多个用逗号分隔, 覆盖 ratelimit.DEFAULT_LIMITS
+NOTIFY_RATE_LIMITS = os.getenv("NOTIFY_RATE_LIMITS", "")
+# 排队等待的最长时间, 另受渠道推送时限 NOTIFY_TIMEOUT 限制, 超过后本次推送失败, 存入 outbox
+NOTIFY_RATE_MAX_WAIT = float(os.getenv("NOTIFY_RATE_MAX_WAIT", 600))
+
+# 相同 (渠道, 标题, 内容) 的通知在 TTL 秒内只推送一次, 默认 0 为关闭, 如 21600 为 6 小时
+NOTIFY_DEDUP_TTL = int(os.getenv("NOTIFY_DEDUP_TTL", 0))
+# 被屏蔽的通知每隔多少秒汇总推送一次
+NOTIFY_DEDUP_SUMMARY = int(os.getenv("NOTIFY_DEDUP_SUMMARY", 24 * 3600))
+
+# 超过渠道上限的通知作为附件发送(tg sendDocument / 企业微信文件), false 为关闭
+NOTIFY_ATTACH = os.getenv("NOTIFY_ATTACH", "true")
+
+# 设为 true 时所有渠道并发推送
+NOTIFY_CONCURRENT = os.getenv("NOTIFY_CONCURRENT", "")
+# 设为 true 时合并本次运行的所有推送, 退出时(或 NOTIFY_COALESCE_WINDOW 秒后)每个渠道推送一份汇总
+NOTIFY_COALESCE = os.getenv("NOTIFY_COALESCE", "")
+# 单个渠道的推送时限(秒), 可用 NOTIFY_TIMEOUT_渠道名 单独设置, 如 NOTIFY_TIMEOUT_TELEGRAM_BOT=30
+NOTIFY_TIMEOUT = float(os.getenv("NOTIFY_TIMEOUT") or 15)
+
+# 所有推送请求改发到此地址(如 http://127.0.0.1:8000), 原 host 放在 X-Notify-Host 头中, 供 notifier.fakeserver 压测使用
+NOTIFY_API_BASE = os.getenv("NOTIFY_API_BASE", "")
+
+# 推送指标, 累计值保存为 json 快照; prom 时另写 Prometheus textfile, false 为关闭
+NOTIFY_METRICS = os.getenv("NOTIFY_METRICS", "prom")
+NOTIFY_METRICS_DIR = os.getenv("NOTIFY_METRICS_DIR", "/ql/log" if os.path.isdir("/ql/log") else NOTIFY_CACHE_DIR)
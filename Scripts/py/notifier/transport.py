@@ -0,0 +1,111 @@
+import threading
+import time
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from . import settings
+
+_sessions = {}
+_lock = threading.Lock()
+# 当前线程这次请求的截止时刻, 由 request(deadline=) 设置
+_local = threading.local()
+
+
+class DeadlineRetry(Retry):
+    """
+    重试不越过 request() 传入的 deadline: 退避后会超时就不再重试, Retry-After 的等待截断到 deadline
+    """
+
+    def is_exhausted(self):
+        deadline = getattr(_local, "deadline", None)
+        if deadline and time.time() + self.get_backoff_time() >= deadline:
+            return True
+        return super().is_exhausted()
+
+    def sleep(self, response=None):
+        deadline = getattr(_local, "deadline", None)
+        if not deadline:
+            return super().sleep(response)
+        wait = None
+        if response is not None and self.respect_retry_after_header:
+            wait = self.get_retry_after(response)
+        if wait is None:
+            wait = self.get_backoff_time()
+        time.sleep(max(min(wait, deadline - time.time()), 0))
+
+
+def new_retry():
+    return DeadlineRetry(
+        total=settings.NOTIFY_RETRY,
+        read=settings.NOTIFY_RETRY_READ,
+        backoff_factor=settings.NOTIFY_RETRY_BACKOFF,
+        status_forcelist=settings.NOTIFY_RETRY_STATUS,
+        # 只对幂等请求按状态码和读超时重试, POST 仅在连接失败(请求未发出)时重试, 避免重复推送
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def get_session(url):
+    """
+    每个 host 一个长连接 session, 同一次运行内的推送复用连接
+    """
+    parts = urllib.parse.urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1,
+                                  pool_maxsize=settings.NOTIFY_POOL_SIZE,
+                                  pool_block=True,
+                                  max_retries=new_retry())
+            session.mount(key, adapter)
+            _sessions[key] = session
+    return session
+
+
+def redirect(url, headers=None):
+    """
+    设置 NOTIFY_API_BASE 时把请求改发到该地址, 返回 (url, headers)
+    """
+    if not settings.NOTIFY_API_BASE:
+        return url, headers
+    parts = urllib.parse.urlsplit(url)
+    base = urllib.parse.urlsplit(settings.NOTIFY_API_BASE)
+    headers = dict(headers or {}, **{"X-Notify-Host": parts.netloc})
+    return urllib.parse.urlunsplit((base.scheme, base.netloc, parts.path, parts.query, "")), headers
+
+
+def request(method, url, deadline=None, **kwargs):
+    """
+    deadline: time.time() 时刻, 之后不再发起重试
+    """
+    if settings.NOTIFY_API_BASE:
+        url, kwargs["headers"] = redirect(url, kwargs.get("headers"))
+        kwargs.pop("proxies", None)
+    kwargs.setdefault("timeout", (settings.NOTIFY_CONNECT_TIMEOUT, settings.NOTIFY_READ_TIMEOUT))
+    _local.deadline = deadline
+    try:
+        return get_session(url).request(method, url, **kwargs)
+    finally:
+        _local.deadline = None
+
+
+def get(url, params=None, **kwargs):
+    return request("GET", url, params=params, **kwargs)
+
+
+def post(url, data=None, json=None, **kwargs):
+    return request("POST", url, data=data, json=json, **kwargs)
+
+
+def close():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from . import attach
+from . import settings
+from . import transport
+
+TOKEN_URL = "https://qyapi.weixin.qq.com/cgi-bin/gettoken"
+MEDIA_URL = "https://qyapi.weixin.qq.com/cgi-bin/media/upload"
+# 临时素材有效期 3 天
+MEDIA_TTL = 3 * 24 * 3600
+# access_token 无效 / 不合法 / 过期
+INVALID_TOKEN_ERRCODES = (40001, 40014, 42001)
+
+_tokens = {}
+_lock = threading.Lock()
+
+
+def cache_file():
+    return os.path.join(settings.NOTIFY_CACHE_DIR, "wecom_token.json")
+
+
+def cache_key(corpid, corpsecret):
+    # 不在缓存文件里明文保存 corpsecret
+    return hashlib.sha256(f"{corpid}:{corpsecret}".encode("utf-8")).hexdigest()
+
+
+def media_cache_file():
+    return os.path.join(settings.NOTIFY_CACHE_DIR, "wecom_media.json")
+
+
+def load_file(path=None):
+    try:
+        with open(path or cache_file(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_file(key, item, path=None):
+    path = path or cache_file()
+    data = load_file(path)
+    now = time.time()
+    data = {k: v for k, v in data.items() if v.get("expires_at", 0) > now}
+    if item:
+        data[key] = item
+    else:
+        data.pop(key, None)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        # 缓存里是 access_token, 只允许本用户读写
+        with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"企业微信缓存写入失败: {e}")
+
+
+def fresh(item):
+    return item and item["expires_at"] - settings.QYWX_TOKEN_MARGIN > time.time()
+
+
+def fetch_access_token(corpid, corpsecret):
+    response = transport.get(TOKEN_URL, params={"corpid": corpid, "corpsecret": corpsecret})
+    data = response.json()
+    if "access_token" not in data:
+        raise Exception("请检查CORPID和CORPSECRET是否正确！\n" + response.text)
+    return {"access_token": data["access_token"],
+            "expires_at": time.time() + int(data.get("expires_in", 7200))}
+
+
+def get_access_token(corpid, corpsecret, force=False):
+    """
+    获取 access_token, 依次查内存和缓存文件, 临近过期或 force 时重新获取
+    """
+    key = cache_key(corpid, corpsecret)
+    with _lock:
+        if not force:
+            item = _tokens.get(key)
+            if not fresh(item):
+                item = load_file().get(key)
+            if fresh(item):
+                _tokens[key] = item
+                return item["access_token"]
+        item = fetch_access_token(corpid, corpsecret)
+        _tokens[key] = item
+        save_file(key, item)
+        return item["access_token"]
+
+
+def invalidate(corpid, corpsecret):
+    key = cache_key(corpid, corpsecret)
+    with _lock:
+        _tokens.pop(key, None)
+        save_file(key, None)
+
+
+def call_with_token(corpid, corpsecret, func):
+    """
+    func(access_token) 返回接口的 json, token 失效时刷新并重试一次
+    """
+    data = func(get_access_token(corpid, corpsecret))
+    if data.get("errcode") in INVALID_TOKEN_ERRCODES:
+        print("企业微信 access_token 已失效, 重新获取")
+        data = func(get_access_token(corpid, corpsecret, force=True))
+    return data
+
+
+def media_key(corpid, url, validator):
+    return hashlib.sha256(f"{corpid}:{url}:{validator}".encode("utf-8")).hexdigest()
+
+
+def media_name(url, content_type):
+    name = posixpath.basename(urllib.parse.urlsplit(url).path) or "media"
+    if not os.path.splitext(name)[1]:
+        name += mimetypes.guess_extension(content_type or "") or ".jpg"
+    return name
+
+
+def upload_media(corpid, corpsecret, response, media_type="file"):
+    """
+    把下载中的 response 上传为临时素材, 返回接口的 json
+    响应带 Content-Length 且未压缩时边下载边上传, 否则先按块写入临时文件
+    """
+    content_type = response.headers.get("Content-Type", "application/octet-stream").split(";")[0]
+    filename = media_name(response.url, content_type)
+    url = f"{MEDIA_URL}?access_token={get_access_token(corpid, corpsecret)}&type={media_type}"
+    size = response.headers.get("Content-Length")
+    if size and not response.headers.get("Content-Encoding"):
+        stream = attach.PipeMultipartStream({}, "media", response.raw.stream(attach.BLOCK_SIZE, decode_content=False),
+                                            int(size), filename, content_type)
+        return transport.post(url, data=stream, headers=stream.headers).json()
+    f = tempfile.NamedTemporaryFile(prefix="notify_media_", delete=False)
+    with f:
+        for chunk in response.iter_content(attach.BLOCK_SIZE):
+            f.write(chunk)
+    stream = attach.MultipartStream({}, "media", f.name, filename, content_type)
+    try:
+        return transport.post(url, data=stream, headers=stream.headers).json()
+    finally:
+        stream.discard()
+
+
+def get_media_id(corpid, corpsecret, url, media_type="file"):
+    """
+    上传 url 指向的文件为临时素材并返回 media_id
+    按 (corpid, url, ETag 或 Last-Modified) 缓存 3 天, 命中时只读取响应头, 不下载正文
+    """
+    for i in range(2):
+        response = transport.get(url, stream=True)
+        try:
+            response.raise_for_status()
+            validator = response.headers.get("ETag") or response.headers.get("Last-Modified") or ""
+            key = media_key(corpid, url, validator)
+            item = load_file(media_cache_file()).get(key)
+            if fresh(item):
+                return item["media_id"]
+            data = upload_media(corpid, corpsecret, response, media_type)
+        finally:
+            response.close()
+        if data.get("errcode") in INVALID_TOKEN_ERRCODES:
+            # 请求体已随下载发出, 刷新 token 后重新下载
+            print("企业微信 access_token 已失效, 重新获取")
+            invalidate(corpid, corpsecret)
+            continue
+        if "media_id" not in data:
+            raise Exception("上传临时素材失败！\n" + json.dumps(data, ensure_ascii=False))
+        created_at = float(data.get("created_at") or time.time())
+        save_file(key, {"media_id": data["media_id"], "expires_at": created_at + MEDIA_TTL}, media_cache_file())
+        return data["media_id"]
+    raise Exception("上传临时素材失败！access_token 无效")
@@ -0,0 +1,113 @@
+"""
+青龙接口的 token 获取与缓存
+
+配置了 QL_CLIENT_ID/QL_CLIENT_SECRET 时通过 /open/auth/token 获取应用 token, 按返回的过期时间缓存到文件,
+未过期时不发额外请求; 否则读取面板的 auth.json. 接口返回 401 时由 QinglongClient 调用 invalidate() 后重新获取
+"""
+import json
+import os
+import time
+
+from . import settings
+from .client import AuthError
+
+# 距过期不足该秒数时提前重新获取
+MARGIN = 60
+
+
+def cache_file():
+    return os.path.join(settings.QL_STORE_DIR, "ql_token.json")
+
+
+def read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class TokenProvider(object):
+    def __init__(self, host=None, client_id=None, client_secret=None, auth_file=None):
+        self.host = host or settings.QL_HOST
+        self.client_id = client_id if client_id is not None else settings.QL_CLIENT_ID
+        self.client_secret = client_secret if client_secret is not None else settings.QL_CLIENT_SECRET
+        self.auth_file = auth_file or settings.QL_AUTH_FILE
+        self.value = None
+        self.expiration = None
+
+    @property
+    def open_api(self):
+        return bool(self.client_id and self.client_secret)
+
+    @property
+    def prefix(self):
+        return "/open" if self.open_api else "/api"
+
+    def valid(self):
+        if not self.value:
+            return False
+        return self.expiration is None or self.expiration - MARGIN > time.time()
+
+    def token(self, session):
+        """
+        返回可用的 token, 只在没有缓存或缓存已过期时请求/读取
+        """
+        if self.valid():
+            return self.value
+        if self.open_api:
+            cached = read_json(cache_file())
+            if cached.get("host") == self.host and cached.get("client_id") == self.client_id:
+                self.value, self.expiration = cached.get("token"), cached.get("expiration")
+                if self.valid():
+                    return self.value
+            self.fetch(session)
+        else:
+            self.load_file()
+        return self.value
+
+    def fetch(self, session):
+        try:
+            response = session.get(f"{self.host}/open/auth/token",
+                                   params={"client_id": self.client_id, "client_secret": self.client_secret},
+                                   timeout=(settings.QL_CONNECT_TIMEOUT, settings.QL_READ_TIMEOUT))
+            body = response.json()
+        except Exception as e:
+            raise AuthError(f"获取开放 API token 失败: {e}")
+        data = body.get("data") or {}
+        if body.get("code") != 200 or not data.get("token"):
+            raise AuthError(f"获取开放 API token 失败: {body.get('message') or body}", body.get("code"))
+        self.value = data["token"]
+        self.expiration = data.get("expiration")
+        try:
+            os.makedirs(settings.QL_STORE_DIR, exist_ok=True)
+            tmp = f"{cache_file()}.{os.getpid()}.tmp"
+            with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+                json.dump({"host": self.host, "client_id": self.client_id, "token": self.value,
+                           "expiration": self.expiration}, f)
+            os.replace(tmp, cache_file())
+        except OSError as e:
+            print(f"缓存 token 失败: {e}")
+
+    def load_file(self):
+        token = read_json(self.auth_file).get("token")
+        if not token:
+            raise AuthError(f"无法从 {self.auth_file} 读取 token, 可配置 QL_CLIENT_ID/QL_CLIENT_SECRET")
+        self.value, self.expiration = token, None
+
+    def invalidate(self, token):
+        """
+        token 被拒绝后调用, 返回是否可能拿到不同的 token
+        """
+        if token != self.value:
+            # 其他请求已经换过 token
+            return True
+        self.value = None
+        if self.open_api:
+            try:
+                os.remove(cache_file())
+            except OSError:
+                pass
+            return True
+        # auth.json 中的 token 只有重新登录面板后才会变化
+        return read_json(self.auth_file).get("token") not in (None, "", token)
@@ -0,0 +1,170 @@
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from . import settings
+
+
+class QinglongError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class AuthError(QinglongError):
+    pass
+
+
+class BulkResult(object):
+    """
+    批量操作的结果, failed 为 [(本批的 id 列表, 错误信息)]
+    """
+
+    def __init__(self, action):
+        self.action = action
+        self.done = []
+        self.failed = []
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    @property
+    def failed_ids(self):
+        return [i for ids, error in self.failed for i in ids]
+
+    def summary(self):
+        text = f"{self.action}成功 {len(self.done)} 个"
+        if self.failed:
+            text += f", 失败 {len(self.failed_ids)} 个"
+            for ids, error in self.failed:
+                text += f"\n  {len(ids)} 个任务: {error}"
+        return text
+
+
+def cron_id(task):
+    # 新版青龙为 id, 旧版为 _id
+    return task["id"] if "id" in task else task["_id"]
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class QinglongClient(object):
+    """
+    青龙面板接口, 复用一个长连接 session, 所有请求带超时
+    """
+
+    def __init__(self, token=None, host=None, batch_size=None, auth=None):
+        """
+        传入 token 时固定使用该 token, 否则由 auth.TokenProvider 获取并在 401 时刷新
+        """
+        self.host = host or settings.QL_HOST
+        self.batch_size = batch_size or settings.QL_BATCH_SIZE
+        self.session = requests.Session()
+        # 只重试连接失败, 写操作不因读超时重发
+        retry = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.5, allowed_methods=None)
+        self.session.mount(self.host, HTTPAdapter(max_retries=retry))
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Content-Type": "application/json;charset=UTF-8",
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.131 Safari/537.36",
+        })
+        self.auth = None
+        self.prefix = "/api"
+        if token:
+            self.set_token(token)
+        else:
+            from .auth import TokenProvider
+            self.auth = auth or TokenProvider(self.host)
+            self.prefix = self.auth.prefix
+
+    def set_token(self, token):
+        self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def url(self, path):
+        return f"{self.host}{path}"
+
+    def request(self, method, path, **kwargs):
+        """
+        返回响应中的 data, code 不为 200 时抛出 QinglongError
+        """
+        kwargs.setdefault("timeout", (settings.QL_CONNECT_TIMEOUT, settings.QL_READ_TIMEOUT))
+        params = dict(kwargs.pop("params", None) or {}, t=round(time.time() * 1000))
+        path = f"{self.prefix}{path}"
+        for attempt in range(2):
+            if self.auth is not None:
+                token = self.auth.token(self.session)
+                self.set_token(token)
+            response = self.session.request(method, self.url(path), params=params, **kwargs)
+            # token 过期或面板重新登录后旧 token 失效, 重新获取后再试一次
+            if response.status_code != 401 or self.auth is None or attempt or not self.auth.invalidate(token):
+                break
+        if response.status_code == 401:
+            raise AuthError(f"{method} {path} 未授权, token 已失效", 401)
+        try:
+            body = response.json()
+        except ValueError:
+            raise QinglongError(f"{method} {path} 返回的不是 json, 状态码 {response.status_code}",
+                                response.status_code)
+        if body.get("code") != 200:
+            raise QinglongError(f"{method} {path} 出错: {body.get('message') or body}",
+                                body.get("code", response.status_code))
+        return body.get("data")
+
+    def crons(self, search=""):
+        data = self.request("GET", "/crons", params={"searchValue": search})
+        # 新版分页接口返回 {"data": [...], "total": n}
+        if isinstance(data, dict):
+            data = data.get("data", [])
+        return data or []
+
+    def bulk(self, action, method, path, ids):
+        """
+        按 batch_size 分批提交, 某一批失败不影响其余批次
+        """
+        result = BulkResult(action)
+        for batch in chunks(list(ids), self.batch_size):
+            try:
+                self.request(method, path, json=batch)
+                result.done.extend(batch)
+            except AuthError:
+                raise
+            except (QinglongError, requests.RequestException) as e:
+                print(f"{action} {len(batch)} 个任务失败: {e}")
+                result.failed.append((batch, str(e)))
+        return result
+
+    def delete(self, ids):
+        return self.bulk("删除", "DELETE", "/crons", ids)
+
+    def disable(self, ids):
+        return self.bulk("禁用", "PUT", "/crons/disable", ids)
+
+    def enable(self, ids):
+        return self.bulk("启用", "PUT", "/crons/enable", ids)
+
+    def run(self, ids):
+        return self.bulk("运行", "PUT", "/crons/run", ids)
+
+    def create(self, task):
+        """
+        按 name/command/schedule 新建任务, 返回新任务
+        """
+        return self.request("POST", "/crons", json={key: task.get(key) for key in ("name", "command", "schedule")})
+
+    def update(self, task, **changes):
+        """
+        修改任务的 name/command/schedule, 其余字段保持不变
+        """
+        body = {key: task.get(key) for key in ("name", "command", "schedule")}
+        body.update(changes)
+        body["id" if "id" in task else "_id"] = cron_id(task)
+        return self.request("PUT", "/crons", json=body)
+
+    def close(self):
+        self.session.close()
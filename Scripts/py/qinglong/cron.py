@@ -0,0 +1,125 @@
+"""
+cron 表达式解析与展开, 支持 5 段(分 时 日 月 周)和带秒的 6 段写法
+"""
+from datetime import datetime, timedelta
+
+# (名称, 最小值, 最大值)
+FIELDS = (("second", 0, 59), ("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7))
+MONTHS = {name: i + 1 for i, name in enumerate(("jan", "feb", "mar", "apr", "may", "jun",
+                                                "jul", "aug", "sep", "oct", "nov", "dec"))}
+WEEKDAYS = {name: i for i, name in enumerate(("sun", "mon", "tue", "wed", "thu", "fri", "sat"))}
+
+
+def parse_value(text, low, high, names):
+    value = names.get(text.lower()) if names else None
+    if value is None:
+        if not text.isdigit():
+            raise ValueError(f"无法识别 {text}")
+        value = int(text)
+    if not low <= value <= high:
+        raise ValueError(f"{value} 超出范围 {low}-{high}")
+    return value
+
+
+def parse_field(text, low, high, names=None):
+    values = set()
+    for part in text.split(","):
+        if not part:
+            raise ValueError(f"{text} 中有空项")
+        part, _, step = part.partition("/")
+        if step:
+            if not step.isdigit() or int(step) == 0:
+                raise ValueError(f"步长 {step} 无效")
+            step = int(step)
+        else:
+            step = 1
+        if part in ("*", "?"):
+            start, end = low, high
+        elif "-" in part:
+            start, end = (parse_value(i, low, high, names) for i in part.split("-", 1))
+            if start > end:
+                raise ValueError(f"{part} 起始值大于结束值")
+        else:
+            start = parse_value(part, low, high, names)
+            # 5/10 表示从 5 开始每 10 一次
+            end = high if step > 1 else start
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Cron(object):
+    """
+    Cron("37 0 * * *"), Cron("30 58 23 * * *")
+    """
+
+    def __init__(self, expr):
+        self.expr = " ".join(expr.split())
+        parts = self.expr.split(" ")
+        if len(parts) == 5:
+            parts = ["0"] + parts
+            self.has_seconds = False
+        elif len(parts) == 6:
+            self.has_seconds = True
+        else:
+            raise ValueError(f"cron 表达式应为 5 或 6 段, 实际 {len(parts)} 段: {expr}")
+        self.parts = parts
+        parsed = []
+        for text, (name, low, high) in zip(parts, FIELDS):
+            names = MONTHS if name == "month" else WEEKDAYS if name == "weekday" else None
+            try:
+                parsed.append(parse_field(text, low, high, names))
+            except ValueError as e:
+                raise ValueError(f"{name} 字段 {text} 无效: {e}")
+        self.seconds, self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # 周日可写作 0 或 7
+        self.weekdays = {i % 7 for i in weekdays}
+        # 日和周都有限制时满足其一即可, 与 crontab 一致
+        self.day_any = parts[3] in ("*", "?")
+        self.weekday_any = parts[5] in ("*", "?")
+
+    def __str__(self):
+        return self.expr
+
+    def match_day(self, day):
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays
+        if self.day_any or self.weekday_any:
+            return (self.day_any or in_days) and (self.weekday_any or in_weekdays)
+        return in_days or in_weekdays
+
+    def times(self, start, end):
+        """
+        依次返回 [start, end) 内的所有触发时间
+        """
+        day = datetime(start.year, start.month, start.day)
+        hours, minutes, seconds = sorted(self.hours), sorted(self.minutes), sorted(self.seconds)
+        while day < end:
+            if self.match_day(day):
+                for h in hours:
+                    for m in minutes:
+                        for s in seconds:
+                            at = day.replace(hour=h, minute=m, second=s)
+                            if start <= at < end:
+                                yield at
+            day += timedelta(days=1)
+
+    def with_minute(self, minute):
+        """
+        返回只把分钟字段换成 minute 的表达式, 保持原来的段数
+        """
+        parts = list(self.parts)
+        parts[1] = str(minute)
+        return " ".join(parts if self.has_seconds else parts[1:])
+
+
+def validate(expr):
+    """
+    返回错误信息, 表达式有效时返回空字符串
+    """
+    try:
+        Cron(expr)
+    except ValueError as e:
+        return str(e)
+    return ""
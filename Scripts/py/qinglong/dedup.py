@@ -0,0 +1,332 @@
+"""
+重复任务判定: 一次拉取 /api/crons, 单次遍历按组合键分组, 每组按策略选出保留的任务,
+其余任务一次性批量删除或禁用
+
+python -m qinglong.dedup --keys command --policy enabled,recent --action disable --dry-run
+python -m qinglong.dedup --history / --revert [批次号]
+"""
+import argparse
+import json
+import os
+import posixpath
+import shlex
+import sys
+import time
+from datetime import datetime
+
+from . import settings, store
+from .client import AuthError, BulkResult, QinglongClient, QinglongError, cron_id
+
+SCRIPTS_DIR = "/ql/scripts/"
+ACTIONS = {"delete": "删除", "disable": "禁用"}
+
+
+def script_path(command):
+    """
+    task /ql/scripts/repo/./jd_bean.js now -> repo/jd_bean.js
+    """
+    command = (command or "").strip()
+    parts = command.split()
+    if "'" in command or '"' in command:
+        try:
+            parts = shlex.split(command)
+        except ValueError:
+            pass
+    if parts and parts[0] in ("task", "ql"):
+        parts = parts[1:]
+    if not parts:
+        return ""
+    path = posixpath.normpath(parts[0])
+    if path.startswith(SCRIPTS_DIR):
+        path = path[len(SCRIPTS_DIR):]
+    return path
+
+
+FIELDS = {
+    "name": lambda task: (task.get("name") or "").strip(),
+    "command": lambda task: " ".join((task.get("command") or "").split()),
+    "schedule": lambda task: " ".join((task.get("schedule") or "").split()),
+    "script": lambda task: script_path(task.get("command")),
+}
+
+
+def created_at(task):
+    # 新版为 ISO 时间字符串 createdAt, 旧版为毫秒时间戳 created
+    value = task.get("createdAt", task.get("created"))
+    if isinstance(value, (int, float)):
+        return value / 1000.0
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return float("inf")
+
+
+POLICIES = {
+    "enabled": lambda task: 1 if task.get("isDisabled") else 0,
+    "oldest": created_at,
+    "recent": lambda task: -(task.get("last_execution_time") or 0),
+}
+
+
+def parse_list(value, choices, what):
+    items = [i.strip() for i in value.split(",") if i.strip()] if isinstance(value, str) else list(value)
+    unknown = [i for i in items if i not in choices]
+    if unknown or not items:
+        raise ValueError(f"未知的{what}: {','.join(unknown) or value}, 可选 {','.join(choices)}")
+    return items
+
+
+class Group(object):
+    def __init__(self, key, keep, drop):
+        self.key = key
+        self.keep = keep
+        self.drop = drop
+
+
+def key_func(keys=None):
+    extract = [FIELDS[i] for i in parse_list(keys or settings.QL_DEDUP_KEYS, FIELDS, "组合键")]
+    return lambda task: tuple(f(task) for f in extract)
+
+
+def plan(tasks, keys=None, policy=None):
+    """
+    返回有重复的 Group 列表, 每组 keep 为保留的任务, drop 为其余任务
+    """
+    key_of = key_func(keys)
+    policy = parse_list(policy or settings.QL_DEDUP_POLICY, POLICIES, "保留策略")
+    rank = [POLICIES[i] for i in policy]
+
+    groups = {}
+    for index, task in enumerate(tasks):
+        key = key_of(task)
+        groups.setdefault(key, []).append((tuple(r(task) for r in rank) + (index,), task))
+
+    result = []
+    for key, items in groups.items():
+        if len(items) < 2:
+            continue
+        best = min(items, key=lambda item: item[0])
+        result.append(Group(key, best[1], [task for order, task in items if task is not best[1]]))
+    return result
+
+
+def targets(groups, action):
+    ids = []
+    for group in groups:
+        for task in group.drop:
+            # 已禁用的任务不用再禁用
+            if action == "disable" and task.get("isDisabled"):
+                continue
+            ids.append(cron_id(task))
+    return ids
+
+
+def describe(task):
+    return f"[{cron_id(task)}] {task.get('name')} | {task.get('schedule')} | {task.get('command')}" + \
+           (" (已禁用)" if task.get("isDisabled") else "")
+
+
+def diff(groups, action):
+    lines = []
+    for group in groups:
+        lines.append(f"= {' / '.join(group.key)}")
+        lines.append(f"  保留 {describe(group.keep)}")
+        for task in group.drop:
+            skip = action == "disable" and task.get("isDisabled")
+            lines.append(f"  跳过 {describe(task)}" if skip else f"- {ACTIONS[action]} {describe(task)}")
+    return "\n".join(lines)
+
+
+def apply(client, groups, action):
+    ids = targets(groups, action)
+    if not ids:
+        return BulkResult(ACTIONS[action])
+    return client.delete(ids) if action == "delete" else client.disable(ids)
+
+
+def changed(conn, action, tasks, keys=None, policy=None):
+    """
+    与上次快照比较, 只保留新增、变化或有任务消失的分组中的任务.
+    返回 (需要判定的任务, 本次快照 {id: (hash, key, task)}, 上次快照, 配置)
+    """
+    key_of = key_func(keys)
+    config = f"{keys or settings.QL_DEDUP_KEYS}|{policy or settings.QL_DEDUP_POLICY}"
+    stored = store.load(conn, action)
+    rows = {}
+    for task in tasks:
+        rows[str(cron_id(task))] = (store.row_hash(task), json.dumps(key_of(task), ensure_ascii=False), task)
+    if store.get_meta(conn, f"config:{action}") != config:
+        # 判重规则变了, 全量判定
+        return tasks, rows, stored, config
+    dirty = {key for i, (h, key, task) in rows.items() if stored.get(i, (None,))[0] != h}
+    dirty.update(key for i, (h, key) in stored.items() if i not in rows)
+    return [task for h, key, task in rows.values() if key in dirty], rows, stored, config
+
+
+def commit(conn, rows, stored, config, action, groups, result):
+    """
+    保存处理后的快照并记录本次删除/禁用的任务. 失败的任务不写入快照, 下次会重新判定
+    """
+    done = {str(i) for i in result.done}
+    failed = {str(i) for i in result.failed_ids}
+    for i in failed:
+        rows.pop(i, None)
+    for i in done:
+        if action == "delete":
+            rows.pop(i, None)
+        else:
+            h, key, task = rows[i]
+            task = dict(task, isDisabled=1)
+            rows[i] = (store.row_hash(task), key, task)
+    store.save(conn, action, rows, stored, config)
+    drops = [task for group in groups for task in group.drop if str(cron_id(task)) in done]
+    return store.record(conn, action, drops, cron_id)
+
+
+def run(client, action, keys=None, policy=None, dry_run=None, conn=None):
+    """
+    返回 (任务总数, 重复分组, BulkResult), dry_run 时 BulkResult 为 None.
+    传入 conn 时只判定相对上次快照有变化的分组
+    """
+    if dry_run is None:
+        dry_run = settings.QL_DEDUP_DRY_RUN.lower() in ("true", "1")
+    tasks = client.crons()
+    if conn is None:
+        groups = plan(tasks, keys, policy)
+    else:
+        subset, rows, stored, config = changed(conn, action, tasks, keys, policy)
+        print(f"任务 {len(tasks)} 个, 相对上次快照需重新判定 {len(subset)} 个")
+        groups = plan(subset, keys, policy)
+    if dry_run:
+        print(diff(groups, action) or "没有重复任务")
+        return tasks, groups, None
+    result = apply(client, groups, action)
+    if conn is not None:
+        batch = commit(conn, rows, stored, config, action, groups, result)
+        if batch:
+            print(f"已记录为第 {batch} 批, 可用 python -m qinglong.dedup --revert {batch} 撤销")
+    return tasks, groups, result
+
+
+def revert(client, conn, batch=None):
+    """
+    撤销一批清理: 禁用的重新启用, 删除的按原 name/command/schedule 重新创建
+    """
+    batch, items = store.pending(conn, batch)
+    if not items:
+        print("没有可撤销的记录")
+        return []
+    reverted = []
+    disabled = {cron_id(task): i for i, action, task in items if action == "disable"}
+    if disabled:
+        result = client.enable(list(disabled))
+        print(result.summary())
+        reverted += [disabled[j] for j in result.done]
+    redisable = []
+    for i, action, task in items:
+        if action != "delete":
+            continue
+        try:
+            created = client.create(task)
+            reverted.append(i)
+        except Exception as e:
+            print(f"恢复 {describe(task)} 失败: {e}")
+            continue
+        if task.get("isDisabled") and isinstance(created, dict):
+            redisable.append(cron_id(created))
+    if redisable:
+        # 删除前就是禁用状态的任务, 重新创建后恢复禁用
+        client.disable(redisable)
+    store.mark_reverted(conn, reverted)
+    print(f"第 {batch} 批已撤销 {len(reverted)}/{len(items)} 个任务, "
+          f"如不调整 QL_DEDUP_KEYS/QL_DEDUP_POLICY 下次清理仍会处理这些任务")
+    return reverted
+
+
+# 定时任务推送用的措辞: (数量前缀, 标题前缀)
+CRON_LABELS = {"delete": ("清除", "清理"), "disable": ("禁用", "禁用")}
+
+
+def cron_main(action, send):
+    """
+    定时任务入口, 清理/禁用重复任务后用 send(title, content) 推送结果, 出错时推送失败并以非零状态退出
+    """
+    count_label, title = CRON_LABELS[action]
+    # 配置了 QL_CLIENT_ID/QL_CLIENT_SECRET 时使用开放 API, 否则读取面板的 auth.json, token 失效时自动重新获取
+    client = QinglongClient()
+    # 只拉取一次任务列表, 按 QL_DEDUP_KEYS 分组, QL_DEDUP_POLICY 决定保留哪一个
+    # 有上次的快照时只判定新增或变化的任务
+    conn = store.open_default()
+    try:
+        tasks, groups, result = run(client, action, conn=conn)
+    except AuthError as e:
+        print(e)
+        send("无法获取token", str(e))
+        sys.exit(1)
+    except Exception as e:
+        print("获取任务列表出错：%s" % e)
+        send("%s失败: %s" % (title, e), "获取任务列表出错, 未做任何%s" % ACTIONS[action])
+        sys.exit(1)
+    finally:
+        client.close()
+        if conn is not None:
+            conn.close()
+    before = "%s前数量为：%d" % (count_label, len(tasks))
+    print(before)
+    if len(groups) == 0:
+        summary = "没有重复任务"
+    elif result is None:
+        summary = "试运行, 重复 %d 组, 未做修改" % len(groups)
+    else:
+        summary = result.summary()
+    after = "%s重复任务后，数量为:%d" % (count_label, len(tasks) - (len(result.done) if result else 0))
+    print(summary)
+    print(after)
+    if result is not None and not result.ok:
+        send("%s部分失败" % title, "\n%s\n%s\n%s" % (before, after, summary))
+    else:
+        send("%s成功" % title, "\n%s\n%s\n%s" % (before, after, summary))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="青龙重复任务清理")
+    parser.add_argument("--action", choices=list(ACTIONS), default="disable")
+    parser.add_argument("--keys", default=None, help="组合键, 如 name,schedule 或 script")
+    parser.add_argument("--policy", default=None, help="保留策略, 如 enabled,oldest")
+    parser.add_argument("--dry-run", action="store_true", help="只输出将要处理的任务")
+    parser.add_argument("--full", action="store_true", help="忽略上次快照, 全量判定")
+    parser.add_argument("--history", action="store_true", help="列出最近的清理批次")
+    parser.add_argument("--revert", nargs="?", type=int, const=0, default=None, metavar="批次号",
+                        help="撤销一批清理, 默认最近一批")
+    parser.add_argument("--token", default=os.getenv("QL_TOKEN"))
+    args = parser.parse_args()
+    conn = None if args.full and args.revert is None and not args.history else store.open_default()
+    if conn is None and (args.history or args.revert is not None):
+        parser.error("任务快照未启用 (QL_STORE)")
+    if args.history:
+        for batch, at, action, count, reverted in store.runs(conn):
+            print(f"第 {batch} 批 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(at))} "
+                  f"{ACTIONS[action]} {count} 个, 已撤销 {reverted or 0} 个")
+        conn.close()
+        return
+    client = QinglongClient(args.token)
+    try:
+        if args.revert is not None:
+            revert(client, conn, args.revert or None)
+            return
+        tasks, groups, result = run(client, args.action, args.keys, args.policy, args.dry_run or None, conn)
+    except QinglongError as e:
+        parser.exit(1, f"{e}\n")
+    finally:
+        client.close()
+        if conn is not None:
+            conn.close()
+    print(f"任务 {len(tasks)} 个, 重复 {len(groups)} 组")
+    if result is not None:
+        print(result.summary())
+
+
+if __name__ == "__main__":
+    main()
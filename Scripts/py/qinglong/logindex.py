@@ -0,0 +1,288 @@
+"""
+青龙任务日志索引
+
+按文件记录已读取的偏移量, 每次只读新增的部分, 从中提取每次运行的开始/结束时间、耗时、状态、推送结果和错误,
+存入 ql_logs.db; 原始日志保持原样, 由面板查看和清理, 已被删除的日志只保留 runs 中的记录
+
+python -m qinglong.logindex                      建立/更新索引
+python -m qinglong.logindex slowest --days 7     本周最慢的脚本
+python -m qinglong.logindex trend jd_bean        某个脚本每天的耗时变化
+python -m qinglong.logindex failures --days 7    按错误聚类
+python -m qinglong.logindex runs jd_bean         某个脚本最近的运行记录
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+
+from . import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT PRIMARY KEY,
+    script TEXT NOT NULL,
+    started REAL NOT NULL,
+    ended REAL,
+    duration REAL,
+    status TEXT NOT NULL,
+    notify TEXT NOT NULL,
+    error TEXT NOT NULL,
+    signature TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_script ON runs (script, started);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+"""
+
+START_RE = re.compile(r"^## 开始执行\.\.\.\s*(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})")
+END_RE = re.compile(r"^## 执行结束\.\.\.\s*(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})?.*?(?:耗时\s*(\d+)\s*秒)?\s*$")
+ERROR_RE = re.compile(r"(Traceback \(most recent call last\)|^\s*[\w.]*(Error|Exception)\b[:\s]|npm ERR!|"
+                      r"Cannot find module|UnhandledPromiseRejection|command not found|Killed$)")
+NOTIFY_OK_RE = re.compile(r"推送成功|发送通知消息成功|通知发送成功")
+NOTIFY_FAIL_RE = re.compile(r"推送失败|发送通知消息失败|通知发送失败")
+# 单次读取的最大字节数
+CHUNK = 1 << 20
+
+
+def db_path():
+    return os.path.join(settings.QL_STORE_DIR, "ql_logs.db")
+
+
+def connect(path=None):
+    os.makedirs(settings.QL_STORE_DIR, exist_ok=True)
+    conn = sqlite3.connect(path or db_path(), timeout=10)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def parse_time(text):
+    return datetime.strptime(text, "%Y-%m-%d %H:%M:%S").timestamp()
+
+
+def signature(line):
+    """
+    同一类错误的不同实例归为一类: 去掉数字、引号中的内容和十六进制串
+    """
+    line = re.sub(r"(['\"]).*?\1", "'…'", line.strip())
+    line = re.sub(r"0x[0-9a-fA-F]+|\d+", "N", line)
+    return line[:160]
+
+
+def new_state(path):
+    started = None
+    try:
+        started = datetime.strptime(os.path.basename(path)[:19], "%Y-%m-%d-%H-%M-%S").timestamp()
+    except ValueError:
+        pass
+    return {"started": started, "ended": None, "duration": None, "error": "", "notify_ok": False,
+            "notify_fail": False}
+
+
+def feed(state, line):
+    """
+    处理一行日志, 遇到结束标记时返回 True
+    """
+    match = START_RE.match(line)
+    if match:
+        state["started"] = parse_time(match.group(1))
+        return False
+    match = END_RE.match(line)
+    if match:
+        if match.group(1):
+            state["ended"] = parse_time(match.group(1))
+        if match.group(2):
+            state["duration"] = int(match.group(2))
+        return True
+    if ERROR_RE.search(line):
+        # python 的 Traceback 最后一行才是异常信息, 保留最后一个匹配的行
+        if not line.startswith("Traceback"):
+            state["error"] = line.strip()[:500]
+        elif not state["error"]:
+            state["error"] = line.strip()
+    if NOTIFY_FAIL_RE.search(line):
+        state["notify_fail"] = True
+    elif NOTIFY_OK_RE.search(line):
+        state["notify_ok"] = True
+    return False
+
+
+def finish(conn, path, script, state, complete):
+    started = state["started"] or os.path.getmtime(path)
+    ended = state["ended"]
+    duration = state["duration"]
+    if duration is None and ended:
+        duration = ended - started
+    if state["error"]:
+        status = "error"
+    else:
+        status = "ok" if complete else "incomplete"
+    notify = "fail" if state["notify_fail"] else "ok" if state["notify_ok"] else ""
+    conn.execute("INSERT OR REPLACE INTO runs (path, script, started, ended, duration, status, notify, error, signature) "
+                 "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                 (path, script, started, ended, duration, status, notify, state["error"],
+                  signature(state["error"]) if state["error"] else ""))
+
+
+def index_file(conn, path, script, stat, known, stale):
+    """
+    从上次的偏移量继续读取, 只处理完整的行
+    """
+    inode, offset, state, done = known or (stat.st_ino, 0, None, 0)
+    if inode != stat.st_ino or stat.st_size < offset:
+        # 文件被替换或截断, 从头读取
+        offset, state, done = 0, None, 0
+    if done:
+        # 每个日志文件对应一次运行, 结束后追加的内容不再处理
+        return False
+    state = json.loads(state) if state else new_state(path)
+    start = offset
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while not done:
+            data = f.read(CHUNK)
+            if not data:
+                break
+            end = data.rfind(b"\n")
+            if end < 0:
+                if len(data) < CHUNK:
+                    break
+                end = len(data) - 1
+            offset += end + 1
+            f.seek(offset)
+            for line in data[:end + 1].decode("utf-8", "ignore").splitlines():
+                if feed(state, line):
+                    done = 1
+                    break
+    if done or stale:
+        finish(conn, path, script, state, bool(done))
+        done = 1
+    elif offset == start and known:
+        return False
+    conn.execute("INSERT OR REPLACE INTO files (path, inode, offset, state, done) VALUES (?, ?, ?, ?, ?)",
+                 (path, stat.st_ino, offset, json.dumps(state), done))
+    return True
+
+
+def update(conn, log_dir=None, timeout=None):
+    """
+    扫描日志目录并更新索引, 返回 (更新的文件数, 清理的文件记录数)
+    """
+    log_dir = log_dir or settings.QL_LOG_DIR
+    if timeout is None:
+        from .schedule import panel_config
+        timeout = panel_config()[1]
+    now = time.time()
+    known = {row[0]: row[1:] for row in conn.execute("SELECT path, inode, offset, state, done FROM files")}
+    seen = set()
+    changed = 0
+    with conn:
+        for script in sorted(os.listdir(log_dir)) if os.path.isdir(log_dir) else []:
+            folder = os.path.join(log_dir, script)
+            if not os.path.isdir(folder):
+                continue
+            for entry in os.scandir(folder):
+                if not entry.name.endswith(".log") or not entry.is_file():
+                    continue
+                seen.add(entry.path)
+                stat = entry.stat()
+                # 超过超时时间仍没有结束标记的按未完成处理
+                stale = now - stat.st_mtime > timeout
+                if index_file(conn, entry.path, script, stat, known.get(entry.path), stale):
+                    changed += 1
+        # 面板已清理的日志不再跟踪偏移量
+        removed = [(path,) for path in known if path not in seen]
+        conn.executemany("DELETE FROM files WHERE path = ?", removed)
+    return changed, len(removed)
+
+
+def since(days):
+    return time.time() - days * 86400
+
+
+def slowest(conn, days=7, limit=20):
+    return conn.execute("SELECT script, COUNT(*), AVG(duration), MAX(duration), SUM(status != 'ok') FROM runs "
+                        "WHERE started >= ? AND duration IS NOT NULL GROUP BY script "
+                        "ORDER BY AVG(duration) DESC LIMIT ?", (since(days), limit)).fetchall()
+
+
+def trend(conn, script, days=30):
+    return conn.execute("SELECT date(started, 'unixepoch', 'localtime') AS day, COUNT(*), AVG(duration), "
+                        "MAX(duration), SUM(status != 'ok') FROM runs WHERE script = ? AND started >= ? "
+                        "GROUP BY day ORDER BY day", (script, since(days))).fetchall()
+
+
+def failures(conn, days=7, limit=20):
+    return conn.execute("SELECT signature, COUNT(*), COUNT(DISTINCT script), GROUP_CONCAT(DISTINCT script), "
+                        "MAX(started), MAX(error) FROM runs WHERE status = 'error' AND started >= ? "
+                        "GROUP BY signature ORDER BY COUNT(*) DESC LIMIT ?", (since(days), limit)).fetchall()
+
+
+def runs(conn, script, limit=20):
+    return conn.execute("SELECT started, duration, status, notify, error, path FROM runs WHERE script = ? "
+                        "ORDER BY started DESC LIMIT ?", (script, limit)).fetchall()
+
+
+def fmt_time(value):
+    return datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M:%S") if value else "-"
+
+
+def fmt_seconds(value):
+    return f"{value:.0f}s" if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="青龙任务日志索引与查询")
+    parser.add_argument("--log-dir", default=None)
+    parser.add_argument("--no-index", action="store_true", help="查询前不更新索引")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("index", help="只更新索引")
+    p = sub.add_parser("slowest", help="平均耗时最长的脚本")
+    p.add_argument("--days", type=float, default=7)
+    p.add_argument("--limit", type=int, default=20)
+    p = sub.add_parser("trend", help="某个脚本每天的耗时")
+    p.add_argument("script")
+    p.add_argument("--days", type=float, default=30)
+    p = sub.add_parser("failures", help="按错误信息聚类")
+    p.add_argument("--days", type=float, default=7)
+    p.add_argument("--limit", type=int, default=20)
+    p = sub.add_parser("runs", help="某个脚本最近的运行记录")
+    p.add_argument("script")
+    p.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    with closing(connect()) as conn:
+        if not args.no_index:
+            changed, removed = update(conn, args.log_dir)
+            if args.command in (None, "index"):
+                print(f"更新 {changed} 个日志文件, 清理 {removed} 条已删除日志的记录")
+        if args.command == "slowest":
+            for script, count, avg, longest, failed in slowest(conn, args.days, args.limit):
+                print(f"{script:<40} 平均 {fmt_seconds(avg):>7} 最长 {fmt_seconds(longest):>7} "
+                      f"运行 {count} 次 异常 {failed} 次")
+        elif args.command == "trend":
+            for day, count, avg, longest, failed in trend(conn, args.script, args.days):
+                print(f"{day} 运行 {count:>3} 次 平均 {fmt_seconds(avg):>7} 最长 {fmt_seconds(longest):>7} "
+                      f"异常 {failed} 次")
+        elif args.command == "failures":
+            for sig, count, scripts, names, last, example in failures(conn, args.days, args.limit):
+                print(f"[{count} 次, {scripts} 个脚本, 最近 {fmt_time(last)}] {sig}")
+                print(f"  脚本: {names}")
+                print(f"  例: {example}")
+        elif args.command == "runs":
+            for started, duration, status, notify, error, path in runs(conn, args.script, args.limit):
+                print(f"{fmt_time(started)} {fmt_seconds(duration):>7} {status:<10} 推送:{notify or '-':<4} "
+                      f"{error[:80]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+定时任务负载模拟与错峰
+
+读取 /api/crons 和 Tasks/*.json 中的定时规则, 按一天或一周展开, 用日志中的实际耗时
+在 MaxConcurrentNum 个并发的队列里模拟执行, 报告并发峰值、排队等待和扎堆的分钟;
+--plan 给出尽量少、尽量小的分钟调整使并发不超过上限, --apply 通过接口修改面板中的任务
+
+python -m qinglong.schedule --tasks ../../Tasks/*.json --span week --plan
+"""
+import argparse
+import contextlib
+import glob
+import heapq
+import json
+import os
+import re
+import statistics
+import sys
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+import requests
+
+from . import settings, tasksub
+from .client import QinglongClient, QinglongError, cron_id
+from .cron import Cron
+from .dedup import script_path
+
+SPANS = {"day": timedelta(days=1), "week": timedelta(days=7)}
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+DURATION_RE = re.compile(r"耗时\s*(\d+)\s*秒")
+# 每个任务最多读取最近多少份日志
+LOG_SAMPLES = 10
+
+
+class Job(object):
+    def __init__(self, name, schedule, source, task=None, command=""):
+        self.name = name
+        self.cron = Cron(schedule)
+        self.source = source
+        self.task = task
+        self.command = command
+        self.runtime = None
+        self.runs = []
+
+    @property
+    def schedule(self):
+        return str(self.cron)
+
+    @property
+    def shiftable(self):
+        # 只调整分钟为单个数字的任务, */5 之类的高频任务保持原样
+        return self.cron.parts[1].isdigit()
+
+
+def parse_duration(text, default=3600):
+    text = str(text or "").strip().strip('"')
+    if not text:
+        return default
+    unit = text[-1].lower()
+    if unit in UNITS:
+        return int(float(text[:-1]) * UNITS[unit])
+    return int(float(text))
+
+
+def panel_config(path=None):
+    """
+    从 config.sh 中读取并发数和超时时间, 文件不存在时使用面板默认值
+    """
+    values = {}
+    try:
+        with open(path or settings.QL_CONFIG_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                match = re.match(r'\s*(MaxConcurrentNum|CommandTimeoutTime)\s*=\s*"?([^"\s#]*)', line)
+                if match:
+                    values[match.group(1)] = match.group(2)
+    except OSError:
+        pass
+    return int(values.get("MaxConcurrentNum") or 5), parse_duration(values.get("CommandTimeoutTime"), 3600)
+
+
+def load_api(client):
+    jobs, skipped = [], []
+    for task in client.crons():
+        if task.get("isDisabled"):
+            continue
+        try:
+            jobs.append(Job(task.get("name") or "", task.get("schedule") or "", "api", task, task.get("command") or ""))
+        except ValueError as e:
+            skipped.append(f"[{cron_id(task)}] {task.get('name')}: {e}")
+    return jobs, skipped
+
+
+def load_tasks(paths):
+    """
+    elecV2P 订阅文件中 type 为 cron 的任务, schedule(倒计时)类型不是周期任务, 不参与模拟
+    """
+    entries, skipped = tasksub.load(paths)
+    jobs = [Job(entry.name, entry.item["time"], os.path.basename(entry.path), command=entry.target)
+            for entry in entries if entry.cron is not None and entry.item.get("running") is not False]
+    return jobs, skipped
+
+
+def log_dirs(command):
+    # 旧版日志目录为脚本名, 新版为 仓库目录_脚本名
+    path = script_path(command)
+    name = os.path.splitext(os.path.basename(path))[0]
+    parent = os.path.dirname(path).replace("/", "_")
+    return [i for i in (f"{parent}_{name}" if parent else "", name) if i]
+
+
+def log_runtime(path):
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 4096, 0))
+            tail = f.read().decode("utf-8", "ignore")
+    except OSError:
+        return None
+    match = DURATION_RE.findall(tail)
+    if match:
+        return int(match[-1])
+    # 没有耗时记录时用 文件名中的开始时间 到 最后修改时间 估计
+    try:
+        started = datetime.strptime(os.path.basename(path)[:19], "%Y-%m-%d-%H-%M-%S")
+        return max(int(os.path.getmtime(path) - started.timestamp()), 0)
+    except (ValueError, OSError):
+        return None
+
+
+def observed_runtime(command, log_dir=None):
+    log_dir = log_dir or settings.QL_LOG_DIR
+    for name in log_dirs(command):
+        files = sorted(glob.glob(os.path.join(log_dir, name, "*.log")))[-LOG_SAMPLES:]
+        values = [i for i in map(log_runtime, files) if i is not None]
+        if values:
+            return int(statistics.median(values))
+    return None
+
+
+def assign_runtimes(jobs, timeout, log_dir=None, default=None):
+    default = default or settings.QL_DEFAULT_RUNTIME
+    for job in jobs:
+        runtime = observed_runtime(job.command, log_dir) if job.command else None
+        if runtime is None and job.task:
+            runtime = job.task.get("last_running_time")
+        # 超过 CommandTimeoutTime 的任务会被终止
+        job.runtime = min(max(int(runtime or default), 1), timeout)
+
+
+def expand(jobs, start, end):
+    for job in jobs:
+        job.runs = [int((i - start).total_seconds()) for i in job.cron.times(start, end)]
+
+
+def simulate(jobs, limit):
+    """
+    按触发时间先后进入并发为 limit 的 FIFO 队列, 返回并发、排队和等待时间统计
+    """
+    arrivals = sorted((at, i) for i, job in enumerate(jobs) for at in job.runs)
+    running = []
+    waiting = deque()
+    delays = []
+    peak_running = peak_waiting = 0
+
+    def release(until):
+        while running and running[0] <= until:
+            finished = heapq.heappop(running)
+            if waiting:
+                at, i = waiting.popleft()
+                delays.append(finished - at)
+                heapq.heappush(running, finished + jobs[i].runtime)
+
+    for at, i in arrivals:
+        release(at)
+        if len(running) < limit:
+            delays.append(0)
+            heapq.heappush(running, at + jobs[i].runtime)
+        else:
+            waiting.append((at, i))
+        peak_running = max(peak_running, len(running))
+        peak_waiting = max(peak_waiting, len(waiting))
+    release(float("inf"))
+    delays.sort()
+    waited = [i for i in delays if i > 0]
+    return {
+        "runs": len(arrivals),
+        "peak_running": peak_running,
+        "peak_demand": peak_running + peak_waiting,
+        "peak_waiting": peak_waiting,
+        "delayed_runs": len(waited),
+        "delay_avg": round(sum(waited) / len(waited), 1) if waited else 0.0,
+        "delay_p99": delays[min(int(len(delays) * 0.99), len(delays) - 1)] if delays else 0,
+        "delay_max": delays[-1] if delays else 0,
+    }
+
+
+def hot_minutes(jobs, start, top=10, fmt="%H:%M"):
+    counter = Counter(at // 60 for job in jobs for at in job.runs)
+    return [((start + timedelta(minutes=m)).strftime(fmt), count) for m, count in counter.most_common(top)]
+
+
+def occupancy(jobs, minutes):
+    load = [0] * minutes
+    for job in jobs:
+        add(load, job, job.runs, 1)
+    return load
+
+
+def add(load, job, runs, value):
+    length = -(-job.runtime // 60)
+    for at in runs:
+        first = at // 60
+        for m in range(first, min(first + length, len(load))):
+            load[m] += value
+
+
+def shifted(job, delta):
+    return [at + delta * 60 for at in job.runs]
+
+
+def plan(jobs, limit, max_shift=30, max_moves=None, pinned=None):
+    """
+    反复找并发最高的分钟, 在覆盖该分钟的任务中挑出移动幅度最小即可不超过 limit 的一个,
+    只改分钟字段且不跨小时, 名称匹配 pinned 的任务不动. 返回 [(任务, 新分钟)]
+    """
+    minutes = max((at // 60 for job in jobs for at in job.runs), default=0) + 1
+    minutes += max((-(-job.runtime // 60) for job in jobs), default=0)
+    load = occupancy(jobs, minutes)
+    moved = {}
+    max_moves = max_moves or len(jobs)
+    while len(moved) < max_moves:
+        peak = max(load) if load else 0
+        if peak <= limit:
+            break
+        hot = load.index(peak)
+        best = None
+        for job in jobs:
+            if job in moved or not job.shiftable or not job.runs or (pinned and pinned.search(job.name)):
+                continue
+            length = -(-job.runtime // 60)
+            if not any(at // 60 <= hot < at // 60 + length for at in job.runs):
+                continue
+            minute = int(job.cron.parts[1])
+            add(load, job, job.runs, -1)
+            for step in range(1, max_shift + 1):
+                if best and step >= abs(best[1]):
+                    break
+                found = None
+                for delta in (step, -step):
+                    if not 0 <= minute + delta <= 59:
+                        continue
+                    runs = shifted(job, delta)
+                    if all(max(load[at // 60:at // 60 + length] or [0]) + 1 <= limit for at in runs):
+                        found = delta
+                        break
+                if found is not None:
+                    best = (job, found)
+                    break
+            add(load, job, job.runs, 1)
+        if best is None:
+            break
+        job, delta = best
+        add(load, job, job.runs, -1)
+        job.runs = shifted(job, delta)
+        add(load, job, job.runs, 1)
+        moved[job] = int(job.cron.parts[1]) + delta
+    return list(moved.items())
+
+
+def apply(client, moves):
+    done, failed = [], []
+    for job, minute in moves:
+        if job.task is None:
+            continue
+        schedule = job.cron.with_minute(minute)
+        try:
+            client.update(job.task, schedule=schedule)
+            done.append(job)
+        except (QinglongError, requests.RequestException) as e:
+            failed.append((job, str(e)))
+    return done, failed
+
+
+def report(name, stats, hot):
+    print(f"\n[{name}] 触发 {stats['runs']} 次, 并发峰值 {stats['peak_running']}, 需求峰值 {stats['peak_demand']}, "
+          f"最多排队 {stats['peak_waiting']}")
+    print(f"  排队 {stats['delayed_runs']} 次, 平均等待 {stats['delay_avg']}s, "
+          f"p99 {stats['delay_p99']}s, 最长 {stats['delay_max']}s")
+    if hot:
+        print("  扎堆分钟: " + ", ".join(f"{at} x{count}" for at, count in hot))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="定时任务负载模拟与错峰")
+    parser.add_argument("--tasks", nargs="*", default=[], help="Tasks/*.json 订阅文件")
+    parser.add_argument("--no-api", action="store_true", help="不读取面板中的任务")
+    parser.add_argument("--span", choices=list(SPANS), default="day")
+    parser.add_argument("--start", default=None, help="模拟起始日期, 默认今天, 如 2021-09-14")
+    parser.add_argument("--limit", type=int, default=None, help="并发数, 默认读取 MaxConcurrentNum")
+    parser.add_argument("--timeout", default=None, help="任务超时, 默认读取 CommandTimeoutTime")
+    parser.add_argument("--log-dir", default=None)
+    parser.add_argument("--plan", action="store_true", help="给出错峰调整")
+    parser.add_argument("--target", type=int, default=None, help="错峰目标并发, 默认等于并发数")
+    parser.add_argument("--max-shift", type=int, default=30, help="单个任务最多移动的分钟数")
+    parser.add_argument("--pin", default="整点|零点", help="名称匹配该正则的任务不调整, 如整点抢兑类任务")
+    parser.add_argument("--apply", action="store_true", help="通过接口修改面板中的任务")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--token", default=os.getenv("QL_TOKEN"))
+    args = parser.parse_args()
+
+    if not args.json:
+        run(parser, args)
+        return
+    # --json 时进度信息写到 stderr, stdout 只有 json
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run(parser, args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+def run(parser, args):
+    limit, timeout = panel_config()
+    limit = args.limit or limit
+    timeout = parse_duration(args.timeout, timeout) if args.timeout else timeout
+    start = datetime.strptime(args.start, "%Y-%m-%d") if args.start else datetime.now().replace(
+        hour=0, minute=0, second=0, microsecond=0)
+    end = start + SPANS[args.span]
+    fmt = "%a %H:%M" if args.span == "week" else "%H:%M"
+
+    jobs, skipped = load_tasks(args.tasks)
+    client = None
+    if not args.no_api:
+        client = QinglongClient(args.token)
+        try:
+            api_jobs, api_skipped = load_api(client)
+        except (QinglongError, requests.RequestException) as e:
+            parser.exit(1, f"{e}\n")
+        jobs, skipped = api_jobs + jobs, api_skipped + skipped
+    for line in skipped:
+        print(f"跳过 {line}")
+    assign_runtimes(jobs, timeout, args.log_dir)
+    expand(jobs, start, end)
+
+    before = simulate(jobs, limit)
+    result = {"limit": limit, "timeout": timeout, "jobs": len(jobs), "before": before,
+              "hot": hot_minutes(jobs, start, fmt=fmt)}
+    if not args.json:
+        print(f"任务 {len(jobs)} 个, 并发数 {limit}, 超时 {timeout}s, 模拟 {start:%Y-%m-%d} 起 {args.span}")
+        report("当前", before, result["hot"])
+    if args.plan or args.apply:
+        moves = plan(jobs, args.target or limit, args.max_shift, pinned=re.compile(args.pin) if args.pin else None)
+        after = simulate(jobs, limit)
+        result["moves"] = [{"name": job.name, "source": job.source, "from": job.schedule,
+                            "to": job.cron.with_minute(minute)} for job, minute in moves]
+        result["after"] = after
+        result["hot_after"] = hot_minutes(jobs, start, fmt=fmt)
+        if not args.json:
+            for item in result["moves"]:
+                print(f"  {item['source']} {item['name']}: {item['from']} -> {item['to']}")
+            report(f"调整 {len(moves)} 个任务后", after, result["hot_after"])
+        if args.apply and client is not None:
+            done, failed = apply(client, moves)
+            result["applied"] = len(done)
+            print(f"已修改 {len(done)} 个面板任务" + (f", 失败 {len(failed)} 个" if failed else ""))
+            for job, error in failed:
+                print(f"  {job.name}: {error}")
+    if client is not None:
+        client.close()
+    return result
+
+
+if __name__ == "__main__":
+    main()
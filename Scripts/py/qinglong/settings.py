@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+# 青龙面板地址
+QL_HOST = os.getenv("QL_HOST", "http://localhost:5700").rstrip("/")
+
+# 连接/读取超时(秒)
+QL_CONNECT_TIMEOUT = float(os.getenv("QL_CONNECT_TIMEOUT", 5))
+QL_READ_TIMEOUT = float(os.getenv("QL_READ_TIMEOUT", 30))
+
+# 批量删除/禁用/启用/运行时每个请求包含的任务数
+QL_BATCH_SIZE = int(os.getenv("QL_BATCH_SIZE", 200))
+
+# 判定重复的组合键, 逗号分隔, 可选 name / command / schedule / script(规范化后的脚本路径)
+QL_DEDUP_KEYS = os.getenv("QL_DEDUP_KEYS", "name")
+# 重复任务中保留哪一个, 按顺序比较: enabled 已启用优先 / oldest 最早创建 / recent 最近运行
+QL_DEDUP_POLICY = os.getenv("QL_DEDUP_POLICY", "enabled,oldest")
+# 为 true 时只输出将要删除/禁用的任务, 不调用接口
+QL_DEDUP_DRY_RUN = os.getenv("QL_DEDUP_DRY_RUN", "")
+
+# 任务快照和删除/禁用记录的 SQLite 文件目录, QL_STORE=false 时每次全量比对
+QL_STORE_DIR = os.getenv("QL_STORE_DIR", "/ql/config" if os.path.isdir("/ql/config") else tempfile.gettempdir())
+QL_STORE = os.getenv("QL_STORE", "true")
+
+# 开放 API 的应用凭据(系统设置 -> 应用设置), 配置后优先使用, 接口前缀为 /open
+QL_CLIENT_ID = os.getenv("QL_CLIENT_ID", "")
+QL_CLIENT_SECRET = os.getenv("QL_CLIENT_SECRET", "")
+# 未配置应用凭据时从面板登录信息中读取 token, 新版青龙在 /ql/data/config 下
+QL_AUTH_FILE = os.getenv("QL_AUTH_FILE", "/ql/data/config/auth.json" if os.path.isfile("/ql/data/config/auth.json")
+                         else "/ql/config/auth.json")
+
+# 面板配置文件, 读取 MaxConcurrentNum/CommandTimeoutTime
+QL_CONFIG_FILE = os.getenv("QL_CONFIG_FILE", "/ql/data/config/config.sh" if os.path.isfile("/ql/data/config/config.sh")
+                           else "/ql/config/config.sh")
+# 任务日志目录, 用于统计每个任务的实际耗时
+QL_LOG_DIR = os.getenv("QL_LOG_DIR", "/ql/data/log" if os.path.isdir("/ql/data/log") else "/ql/log")
+# 日志中找不到耗时的任务按该秒数估计
+QL_DEFAULT_RUNTIME = int(os.getenv("QL_DEFAULT_RUNTIME", 60))
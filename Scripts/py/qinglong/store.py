@@ -0,0 +1,142 @@
+"""
+任务快照和清理记录
+
+crons 按操作(delete/disable)分别保存上次清理后的任务列表及每行内容的哈希,
+下次只对新增、变化、消失的任务所在分组重新判定;
+history 记录每次删除/禁用的任务原始数据, 用于撤销
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from . import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crons (
+    scope TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    command TEXT NOT NULL,
+    schedule TEXT NOT NULL,
+    updated TEXT NOT NULL DEFAULT '',
+    hash TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (scope, id)
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run INTEGER NOT NULL,
+    at REAL NOT NULL,
+    action TEXT NOT NULL,
+    cron_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    reverted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS history_run ON history (run);
+CREATE TABLE IF NOT EXISTS meta (
+    k TEXT PRIMARY KEY,
+    v TEXT NOT NULL
+);
+"""
+
+
+def enabled():
+    return settings.QL_STORE.lower() not in ("", "false", "0")
+
+
+def db_path():
+    return os.path.join(settings.QL_STORE_DIR, "ql_crons.db")
+
+
+def connect(path=None):
+    conn = sqlite3.connect(path or db_path(), timeout=10)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def row_hash(task):
+    # 只取判重相关的字段, updatedAt、last_execution_time 等随运行变化的字段不参与
+    content = [task.get("name"), task.get("command"), task.get("schedule"), bool(task.get("isDisabled"))]
+    return hashlib.sha1(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def get_meta(conn, key, default=""):
+    row = conn.execute("SELECT v FROM meta WHERE k = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def load(conn, scope):
+    """
+    返回 {id: (hash, key)}
+    """
+    return {i: (h, k) for i, h, k in conn.execute("SELECT id, hash, key FROM crons WHERE scope = ?", (scope,))}
+
+
+def save(conn, scope, rows, stored, config):
+    """
+    rows 为 {id: (hash, key, task)}, 只写入新增和变化的行, 删除已不存在的行
+    """
+    with conn:
+        conn.executemany("DELETE FROM crons WHERE scope = ? AND id = ?", [(scope, i) for i in stored if i not in rows])
+        conn.executemany(
+            "INSERT OR REPLACE INTO crons (scope, id, name, command, schedule, updated, hash, key) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(scope, i, task.get("name") or "", task.get("command") or "", task.get("schedule") or "",
+              str(task.get("updatedAt", task.get("updated", ""))), h, k)
+             for i, (h, k, task) in rows.items() if stored.get(i, (None,))[0] != h])
+        conn.execute("INSERT OR REPLACE INTO meta (k, v) VALUES (?, ?)", (f"config:{scope}", config))
+
+
+def record(conn, action, tasks, cron_id):
+    """
+    记录本次删除/禁用的任务, 返回批次号
+    """
+    if not tasks:
+        return None
+    with conn:
+        run = (conn.execute("SELECT MAX(run) FROM history").fetchone()[0] or 0) + 1
+        now = time.time()
+        conn.executemany(
+            "INSERT INTO history (run, at, action, cron_id, name, payload) VALUES (?, ?, ?, ?, ?, ?)",
+            [(run, now, action, str(cron_id(task)), task.get("name") or "", json.dumps(task, ensure_ascii=False))
+             for task in tasks])
+    return run
+
+
+def runs(conn, limit=10):
+    """
+    最近的清理批次: [(批次号, 时间, 操作, 任务数, 已撤销数)]
+    """
+    return conn.execute("SELECT run, MIN(at), action, COUNT(*), SUM(reverted) FROM history "
+                        "GROUP BY run, action ORDER BY run DESC LIMIT ?", (limit,)).fetchall()
+
+
+def pending(conn, run=None):
+    """
+    某一批次(默认最近一次)中未撤销的记录: [(记录 id, 操作, 任务)]
+    """
+    if run is None:
+        run = conn.execute("SELECT MAX(run) FROM history").fetchone()[0]
+    rows = conn.execute("SELECT id, action, payload FROM history WHERE run = ? AND reverted = 0 ORDER BY id",
+                        (run,)).fetchall()
+    return run, [(i, action, json.loads(payload)) for i, action, payload in rows]
+
+
+def mark_reverted(conn, ids):
+    with conn:
+        conn.executemany("UPDATE history SET reverted = 1 WHERE id = ?", [(i,) for i in ids])
+
+
+def open_default():
+    if not enabled():
+        return None
+    try:
+        os.makedirs(settings.QL_STORE_DIR, exist_ok=True)
+        return connect()
+    except (OSError, sqlite3.Error) as e:
+        print(f"打开任务快照失败, 本次全量比对: {e}")
+        return None
+
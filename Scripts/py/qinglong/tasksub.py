@@ -0,0 +1,231 @@
+"""
+elecV2P 任务订阅(Tasks/*.json)的校验与合并
+
+一次读取所有订阅文件, 检查字段和 cron 语法, 按 job.target 去重后合并为一个订阅,
+同时生成按 target 和按触发时间的索引, 并列出在同一秒触发的任务
+
+python -m qinglong.tasksub ../../Tasks/*.json ../../Tasks/backup/*.json -o merged.json --index merged.index.json
+"""
+import argparse
+import json
+import re
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from .cron import Cron
+
+TASK_TYPES = ("cron", "schedule")
+JOB_TYPES = ("runjs", "exec", "taskstart", "taskstop")
+MIRROR_RE = re.compile(r"https?://[^/\s]+/(?=https?://)")
+# 触发时间按一周展开, 周几限定的任务也能覆盖到
+SPAN = timedelta(days=7)
+
+
+class Entry(object):
+    def __init__(self, path, index, item):
+        self.path = path
+        self.index = index
+        self.item = item
+        self.cron = None
+
+    @property
+    def name(self):
+        return self.item.get("name") or ""
+
+    @property
+    def target(self):
+        return (self.item.get("job") or {}).get("target") or ""
+
+    @property
+    def key(self):
+        # 同一个 target 以不同的 job.type 运行视为不同任务
+        return (self.item["job"]["type"], normalize_target(self.target))
+
+    def where(self):
+        return f"{self.path}#{self.index} {self.name}"
+
+
+def normalize_target(target):
+    # https://ghproxy.com/https://raw.githubusercontent.com/... 与原地址视为同一个
+    target = MIRROR_RE.sub("", target.strip())
+    if "://" in target and " " not in target:
+        scheme, _, rest = target.partition("://")
+        host, _, path = rest.partition("/")
+        target = f"{scheme.lower()}://{host.lower()}/{path}".rstrip("/")
+    return target
+
+
+def check_item(item):
+    """
+    返回该任务的错误列表
+    """
+    if not isinstance(item, dict):
+        return ["不是对象"]
+    errors = []
+    if not isinstance(item.get("name"), str) or not item["name"].strip():
+        errors.append("缺少 name")
+    if item.get("type") not in TASK_TYPES:
+        errors.append(f"type 应为 {'/'.join(TASK_TYPES)}, 实际为 {item.get('type')!r}")
+    if "running" in item and not isinstance(item["running"], bool):
+        errors.append("running 应为 true/false")
+    job = item.get("job")
+    if not isinstance(job, dict):
+        errors.append("缺少 job")
+    else:
+        if job.get("type") not in JOB_TYPES:
+            errors.append(f"job.type 应为 {'/'.join(JOB_TYPES)}, 实际为 {job.get('type')!r}")
+        if not isinstance(job.get("target"), str) or not job["target"].strip():
+            errors.append("缺少 job.target")
+    time = item.get("time")
+    if not isinstance(time, str) or not time.strip():
+        errors.append("缺少 time")
+    elif item.get("type") == "cron":
+        try:
+            Cron(time)
+        except ValueError as e:
+            errors.append(str(e))
+    elif item.get("type") == "schedule" and not all(i.isdigit() for i in time.split()):
+        # schedule 为倒计时: 间隔秒数 [重复次数 随机 ...]
+        errors.append(f"schedule 的 time 应为数字: {time}")
+    return errors
+
+
+def load(paths):
+    """
+    返回 (有效任务列表, 错误列表), 错误为 "文件#序号 名称: 原因"
+    """
+    entries, errors = [], []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            errors.append(f"{path}: {e}")
+            continue
+        if not isinstance(data, dict) or not isinstance(data.get("list"), list):
+            errors.append(f"{path}: 缺少 list")
+            continue
+        for index, item in enumerate(data["list"]):
+            entry = Entry(path, index, item)
+            problems = check_item(item)
+            if problems:
+                errors.append(f"{entry.where()}: {'; '.join(problems)}")
+                continue
+            if item["type"] == "cron":
+                entry.cron = Cron(item["time"])
+            entries.append(entry)
+    return entries, errors
+
+
+def dedupe(entries):
+    """
+    相同 target 只保留最先出现的一个, 返回 (保留的任务, [(保留的, 去掉的)])
+    """
+    kept, dropped = {}, []
+    for entry in entries:
+        first = kept.get(entry.key)
+        if first is None:
+            kept[entry.key] = entry
+        else:
+            dropped.append((first, entry))
+    return list(kept.values()), dropped
+
+
+def fire_times(entries, start=None):
+    """
+    {任务: [触发时间]}, 只展开 cron 类型且未停用的任务
+    """
+    start = start or datetime(2021, 1, 4)
+    return {entry: list(entry.cron.times(start, start + SPAN)) for entry in entries
+            if entry.cron is not None and entry.item.get("running") is not False}
+
+
+def label(entry):
+    return f"{entry.name}({entry.path.rsplit('/', 1)[-1]})"
+
+
+def conflicts(times):
+    """
+    同一秒触发的任务组合: [(任务名列表, 重合次数, 第一次重合的时间)]
+    """
+    by_second = defaultdict(list)
+    for entry, ats in times.items():
+        for at in ats:
+            by_second[at].append(entry)
+    groups = Counter()
+    first = {}
+    for at in sorted(by_second):
+        names = by_second[at]
+        if len(names) < 2:
+            continue
+        key = tuple(sorted({label(i) for i in names}))
+        groups[key] += 1
+        first.setdefault(key, at)
+    return [(list(key), count, first[key]) for key, count in groups.most_common()]
+
+
+def build_index(entries, times):
+    """
+    by_target 以去重时使用的规范化地址为键, by_time 为 {触发时间: [任务序号]}
+    """
+    by_target = {}
+    by_time = defaultdict(set)
+    for i, entry in enumerate(entries):
+        by_target[normalize_target(entry.target)] = i
+        for at in times.get(entry, ()):
+            by_time[at.strftime("%H:%M:%S")].add(i)
+    return {"by_target": by_target, "by_time": {k: sorted(v) for k, v in sorted(by_time.items())}}
+
+
+def compile_subscription(entries, name, resource=""):
+    return {
+        "name": name,
+        "desc": f"由 {len({entry.path for entry in entries})} 个订阅合并, 共 {len(entries)} 个任务",
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "author": "",
+        "resource": resource,
+        "list": [entry.item for entry in entries],
+    }
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校验并合并 elecV2P 任务订阅")
+    parser.add_argument("files", nargs="+", help="订阅文件, 重复的 target 以先列出的文件为准")
+    parser.add_argument("-o", "--output", default=None, help="合并后的订阅文件")
+    parser.add_argument("--index", default=None, help="按 target 和触发时间的索引文件")
+    parser.add_argument("--name", default="合并订阅")
+    parser.add_argument("--resource", default="", help="合并后订阅的远程地址")
+    parser.add_argument("--strict", action="store_true", help="有同一秒触发的任务时也返回非 0")
+    args = parser.parse_args()
+
+    entries, errors = load(args.files)
+    for line in errors:
+        print(f"错误 {line}")
+    kept, dropped = dedupe(entries)
+    for first, entry in dropped:
+        differs = "" if first.item["time"].split() == entry.item["time"].split() else \
+            f", 时间不同 {first.item['time']} / {entry.item['time']}"
+        print(f"重复 {entry.where()} 与 {first.where()} 的 target 相同{differs}")
+    times = fire_times(kept)
+    clashes = conflicts(times)
+    for names, count, at in clashes:
+        print(f"同秒触发 {count} 次, 首次 {at:%a %H:%M:%S}: {', '.join(names)}")
+    print(f"读取 {len(entries) + len(errors)} 项, 错误 {len(errors)}, 去重 {len(dropped)}, "
+          f"保留 {len(kept)}, 同秒触发 {len(clashes)} 组")
+    if args.output:
+        write_json(args.output, compile_subscription(kept, args.name, args.resource))
+    if args.index:
+        write_json(args.index, build_index(kept, times))
+    if errors or (args.strict and clashes):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 # !/usr/bin/env python3
 import difflib
+import json
 import os
 import re
+import sqlite3
 import time
 import asyncio
 import asyncio.subprocess
@@ -15,6 +17,7 @@ api_hash = '1234567890abcdefgh'  # your telegram api hash
 bot_token = '1234567890:ABCDEFGHIJKLMNOPQRST'  # your bot_token
 admin_id = 1234567890  # your chat id
 save_path = '/root/Help'  # file save path
+ledger_file = os.path.join(save_path, 'download_ledger.db')  # 下载记录，/start 不带 offset_id 时从上次的位置继续
 upload_file_set = False  # set upload file to google drive
 drive_id = '5FyJClXmsqNw0-Rz19'  # google teamdrive id 如果使用OD，删除''内的内容即可。
 drive_name = 'gc'  # rclone drive name
@@ -28,12 +31,71 @@ filter_file_name = ['sh'] # 指定文件后缀，可以填jpg、avi、mkv、rar
 # pip install telethon cryptg pillow aiohttp hachoir # 所需的依赖模块
 #***********************************************************************************#
 
+# 分块下载的块大小, 需为 4096 的倍数且能整除 1MB; 每写入 SAVE_EVERY 块记录一次断点
+chunk_size = 512 * 1024
+SAVE_EVERY = 8
+
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
                     level=logging.WARNING)
 logger = logging.getLogger(__name__)
 queue = asyncio.Queue()
 
 
+# 下载记录: 每条消息的下载状态(queued / done / skipped / failed), 以及每个频道已遍历到的消息 id
+def open_ledger():
+    os.makedirs(os.path.dirname(ledger_file), exist_ok=True)
+    conn = sqlite3.connect(ledger_file)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS downloads (
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            document_id INTEGER,
+            size INTEGER,
+            status TEXT NOT NULL,
+            path TEXT NOT NULL DEFAULT '',
+            updated REAL NOT NULL,
+            PRIMARY KEY (chat_id, message_id)
+        );
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            chat_id INTEGER PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            updated REAL NOT NULL
+        );
+    """)
+    return conn
+
+
+def is_downloaded(chat_id, message_id):
+    row = ledger.execute('SELECT status FROM downloads WHERE chat_id = ? AND message_id = ?',
+                         (chat_id, message_id)).fetchone()
+    return row is not None and row[0] == 'done'
+
+
+def set_status(chat_id, message, status, path=''):
+    media_id, file_size = get_media_info(message)
+    with ledger:
+        ledger.execute('INSERT OR REPLACE INTO downloads (chat_id, message_id, document_id, size, status, path, updated) '
+                       'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                       (chat_id, message.id, media_id, file_size, status, path, time.time()))
+
+
+def save_checkpoint(chat_id, last_id):
+    with ledger:
+        ledger.execute('INSERT INTO checkpoints (chat_id, last_id, updated) VALUES (?, ?, ?) '
+                       'ON CONFLICT(chat_id) DO UPDATE SET last_id = MAX(last_id, excluded.last_id), '
+                       'updated = excluded.updated', (chat_id, last_id, time.time()))
+
+
+# 续传位置: 最早一条仍在排队或下载失败的消息之前, 都没有时为已遍历到的位置
+# 失败(failed)的消息在下次 /start 时重新入队重试, 已跳过(skipped)的消息不会拖住续传位置
+def resume_offset(chat_id):
+    pending = ledger.execute("SELECT MIN(message_id) FROM downloads "
+                             "WHERE chat_id = ? AND status IN ('queued', 'failed')", (chat_id,)).fetchone()[0]
+    row = ledger.execute('SELECT last_id FROM checkpoints WHERE chat_id = ?', (chat_id,)).fetchone()
+    last_id = row[0] if row else 0
+    return min(pending - 1, last_id) if pending else last_id
+
+
 # 文件夹/文件名称处理
 def validateTitle(title):
     r_str = r"[\/\\\:\*\?\"\<\>\|\n]"  # '/ \ : * ? " < > |'
@@ -75,6 +137,76 @@ def bytes_to_string(byte_count):
     )
 
 
+# 断点文件: 下载中的数据写入 .part, 已落盘的字节数记录在 .part.json
+def read_part_state(state_path):
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_part_state(state_path, state):
+    tmp_path = f'{state_path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def get_media_info(message):
+    media = message.document or message.photo
+    size = message.file.size if message.file else None
+    return getattr(media, 'id', None), size
+
+
+# 断点续传下载, 返回 False 表示本地已有完整文件, 跳过下载
+async def download_resumable(message, file_path):
+    media_id, file_size = get_media_info(message)
+    if os.path.exists(file_path):
+        if file_size and os.path.getsize(file_path) == file_size:
+            return False
+        os.remove(file_path)
+    part_path = f'{file_path}.part'
+    state_path = f'{part_path}.json'
+    state = read_part_state(state_path)
+    offset = 0
+    if os.path.exists(part_path) and state.get('id') == media_id and state.get('size') == file_size:
+        # 只信任已记录的偏移, 并对齐到完整的块
+        offset = min(state.get('offset', 0), os.path.getsize(part_path))
+        offset -= offset % chunk_size
+    if offset:
+        print(f"{get_local_time()} 从 {bytes_to_string(offset)} 处继续下载：{os.path.basename(file_path)}")
+    state = {'id': media_id, 'size': file_size, 'offset': offset}
+    with open(part_path, 'r+b' if offset else 'wb') as f:
+        f.truncate(offset)
+        f.seek(offset)
+        count = 0
+        async for chunk in client.iter_download(message.media, offset=offset, request_size=chunk_size,
+                                                file_size=file_size):
+            f.write(chunk)
+            offset += len(chunk)
+            count += 1
+            if count % SAVE_EVERY == 0:
+                f.flush()
+                os.fsync(f.fileno())
+                state['offset'] = offset
+                write_part_state(state_path, state)
+        f.flush()
+        os.fsync(f.fileno())
+        state['offset'] = offset
+        write_part_state(state_path, state)
+    # 数据流提前结束时保留 .part, 下次从已写入的位置继续
+    part_size = os.path.getsize(part_path)
+    if file_size and part_size != file_size:
+        raise IOError(f'下载不完整: {bytes_to_string(part_size)} / {bytes_to_string(file_size)}')
+    os.replace(part_path, file_path)
+    try:
+        os.remove(state_path)
+    except OSError:
+        pass
+    return True
+
+
 async def worker(name):
     while True:
         queue_item = await queue.get()
@@ -82,23 +214,25 @@ async def worker(name):
         chat_title = queue_item[1]
         entity = queue_item[2]
         file_name = queue_item[3]
-        for filter_file in filter_file_name:
-            if not file_name.endswith(filter_file):
-                return
+        if not any(file_name.endswith(filter_file) for filter_file in filter_file_name):
+            # 不符合文件类型过滤的消息记为跳过, 续传时不再停在这里
+            set_status(entity.id, message, 'skipped')
+            queue.task_done()
+            continue
         dirname = validateTitle(f'{chat_title}({entity.id})')
         datetime_dir_name = message.date.strftime("%Y年%m月")
         file_save_path = os.path.join(save_path, dirname, datetime_dir_name)
         if not os.path.exists(file_save_path):
             os.makedirs(file_save_path)
-        # 判断文件是否在本地存在
-        if file_name in os.listdir(file_save_path):
-            os.remove(os.path.join(file_save_path, file_name))
         print(f"{get_local_time()} 开始下载： {chat_title} - {file_name}")
         try:
             loop = asyncio.get_event_loop()
-            task = loop.create_task(client.download_media(
+            # 本地已有大小一致的文件时跳过, 中断或重试时从 .part 记录的位置继续
+            task = loop.create_task(download_resumable(
                 message, os.path.join(file_save_path, file_name)))
-            await asyncio.wait_for(task, timeout=3600)
+            if not await asyncio.wait_for(task, timeout=3600):
+                print(f"{get_local_time()} - {file_name} 已存在，跳过下载")
+            set_status(entity.id, message, 'done', os.path.join(file_save_path, file_name))
             if upload_file_set:
                 proc = await asyncio.create_subprocess_exec('fclone',
                                                             'move',
@@ -117,6 +251,7 @@ async def worker(name):
                 await queue.put((new_message, chat_title, entity, file_name))
         except Exception as e:
             print(f"{get_local_time()} - {file_name} {e}")
+            set_status(entity.id, message, 'failed')
             await bot.send_message(admin_id, f'Error!\n\n{e}\n\n{file_name}')
         finally:
             queue.task_done()
@@ -134,15 +269,19 @@ async def handler(update):
     if len(text) == 1:
         await bot.send_message(admin_id, '参数错误，请按照参考格式输入:\n\n '
                                          '<i>/start https://t.me/fkdhlg 0 </i>\n\n'
-                                         'Tips:如果不输入offset_id，默认从第一条开始下载。', parse_mode='HTML')
+                                         'Tips:如果不输入offset_id，从上次下载到的位置继续，首次从第一条开始下载。',
+                               parse_mode='HTML')
         return
     elif len(text) == 2:
         chat_id = text[1]
         try:
             entity = await client.get_entity(chat_id)
             chat_title = entity.title
-            offset_id = 0
-            await update.reply(f'开始从{chat_title}的第一条消息下载。')
+            offset_id = resume_offset(entity.id)
+            if offset_id:
+                await update.reply(f'从{chat_title}上次的位置继续，开始从第{offset_id}条消息下载。')
+            else:
+                await update.reply(f'开始从{chat_title}的第一条消息下载。')
         except:
             await update.reply('chat输入错误，请输入频道或群组的链接')
             return
@@ -159,12 +298,23 @@ async def handler(update):
     else:
         await bot.send_message(admin_id, '参数错误，请按照参考格式输入:\n\n '
                                          '<i>/start https://t.me/fkdhlg 0 </i>\n\n'
-                                         'Tips:如果不输入offset_id，默认从第一条开始下载。', parse_mode='HTML')
+                                         'Tips:如果不输入offset_id，从上次下载到的位置继续，首次从第一条开始下载。',
+                               parse_mode='HTML')
         return
     if chat_title:
         print(f'{get_local_time()} - 开始下载：{chat_title}({entity.id}) - {offset_id}')
         last_msg_id = 0
+        skipped = 0
+        scanned = 0
         async for message in client.iter_messages(entity, offset_id=offset_id, reverse=True, limit=None):
+            scanned += 1
+            # 遍历大频道时定期记录位置, 中途重启也能续上
+            if last_msg_id and scanned % 100 == 0:
+                save_checkpoint(entity.id, last_msg_id)
+            # 已经下载完成的消息不再进入队列
+            if message.media and is_downloaded(entity.id, message.id):
+                skipped += 1
+                continue
             if message.media:
                 # 如果是一组媒体
                 caption = await get_group_caption(message) if (
@@ -201,9 +351,13 @@ async def handler(update):
                     file_name = f'{message.id} - {caption}{message.photo.id}.jpg'
                 else:
                     continue
+                set_status(entity.id, message, 'queued')
                 await queue.put((message, chat_title, entity, file_name))
                 last_msg_id = message.id
-        await bot.send_message(admin_id, f'{chat_title} all message added to task queue, last message is：{last_msg_id}')
+        if last_msg_id:
+            save_checkpoint(entity.id, last_msg_id)
+        await bot.send_message(admin_id, f'{chat_title} all message added to task queue, last message is：{last_msg_id}'
+                                         f'\n跳过已下载的消息 {skipped} 条')
 
 
 @events.register(events.NewMessage())
@@ -254,11 +408,15 @@ async def all_chat_download(update):
         # 过滤文件名称中的广告等词语
         for filter_keyword in filter_list:
             file_name = file_name.replace(filter_keyword, "")
+        if is_downloaded(entity.id, message.id):
+            return
         print(chat_title, file_name)
+        set_status(entity.id, message, 'queued')
         await queue.put((message, chat_title, entity, file_name))
 
 
 if __name__ == '__main__':
+    ledger = open_ledger()
     bot = TelegramClient('telegram_channel_downloader_bot',
                          api_id, api_hash).start(bot_token=str(bot_token))
     client = TelegramClient(
@@ -278,4 +436,5 @@ if __name__ == '__main__':
         for task in tasks:
             task.cancel()
         client.disconnect()
+        ledger.close()
         print('Stopped!')